@@ -0,0 +1,154 @@
+from aiohttp import web
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+
+# answer vocabulary, picked per prompt so repeated runs return the same extraction.
+VOCABULARY = [
+    "python", "sql", "communication", "teamwork", "aws", "excel", "project management",
+    "bachelor's degree", "3+ years", "english and cantonese", "data analysis", "java",
+]
+
+
+class FakeOllamaServer:
+    """
+    Local stand-in for the Ollama HTTP API (/api/chat and /api/embed) for offline benchmarks.
+
+    A request takes `latency` seconds plus its prompt tokens at `prompt_rate` and its output
+    tokens at `eval_rate` tokens/sec, and only `parallel` requests are served at a time, like
+    OLLAMA_NUM_PARALLEL. Chat answers are generated from the requested json schema and carry
+    the same token and duration fields as a real response, streamed as ndjson with stream=true.
+    """
+    def __init__(self, latency: float = 0.02, prompt_rate: float = 2000, eval_rate: float = 200, parallel: int = 4, embedding_dim: int = 1024):
+        self.latency = latency
+        self.prompt_rate = prompt_rate
+        self.eval_rate = eval_rate
+        self.parallel = parallel
+        self.embedding_dim = embedding_dim
+        self.requests = 0
+        self._slots = asyncio.Semaphore(parallel)
+        self._runner = None
+        self.url = None
+
+
+    @staticmethod
+    def _tokens(text: str) -> int:
+        # roughly 4 characters per token, like the trimmer's estimate.
+        return max(1, len(text) // 4)
+
+
+    def _answer(self, schema: dict, rng: random.Random) -> dict:
+        answer = {}
+        for name, spec in schema.get("properties", {}).items():
+            types = {spec.get("type")} | {option.get("type") for option in spec.get("anyOf", [])}
+            if "array" in types:
+                answer[name] = rng.sample(VOCABULARY, 3)
+            elif "string" in types:
+                answer[name] = f"{name.replace('_', ' ')} {rng.randint(1, 100)}"
+            else:
+                answer[name] = None
+        return answer
+
+
+    def _stats(self, start: float, prompt_tokens: int, eval_tokens: int) -> dict:
+        prompt_seconds = prompt_tokens / self.prompt_rate
+        eval_seconds = eval_tokens / self.eval_rate
+        return {
+            "model": "",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": eval_tokens,
+            "eval_duration": int(eval_seconds * 1e9),
+        }
+
+
+    async def _generate(self, prompt_tokens: int, eval_tokens: int) -> dict:
+        async with self._slots:
+            start = time.perf_counter()
+            await asyncio.sleep(self.latency + prompt_tokens / self.prompt_rate + eval_tokens / self.eval_rate)
+            self.requests += 1
+        return self._stats(start, prompt_tokens, eval_tokens)
+
+
+    async def _stream(self, request: web.Request, model: str, content: str, prompt_tokens: int) -> web.StreamResponse:
+        # ndjson chunks like ollama with stream=true, words arrive at eval_rate.
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        words = content.split(" ")
+        async with self._slots:
+            start = time.perf_counter()
+            await asyncio.sleep(self.latency + prompt_tokens / self.prompt_rate)
+            for i, word in enumerate(words):
+                await asyncio.sleep(self._tokens(word) / self.eval_rate)
+                chunk = {"model": model, "message": {"role": "assistant", "content": word if i == 0 else f" {word}"}, "done": False}
+                await response.write(json.dumps(chunk).encode("utf-8") + b"\n")
+            self.requests += 1
+        final = self._stats(start, prompt_tokens, self._tokens(content))
+        final.update(model=model, message={"role": "assistant", "content": ""})
+        await response.write(json.dumps(final).encode("utf-8") + b"\n")
+        await response.write_eof()
+        return response
+
+
+    async def _chat(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt = "".join(message.get("content", "") for message in body.get("messages", []))
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        num_predict = (body.get("options") or {}).get("num_predict") or 1500
+        if isinstance(body.get("format"), dict):
+            content = json.dumps(self._answer(body["format"], rng))
+        else:
+            # free text, e.g. report sections.
+            content = " ".join(rng.choices(VOCABULARY, k=max(1, min(num_predict, 400) // 2)))
+        if body.get("stream"):
+            return await self._stream(request, body.get("model", ""), content, self._tokens(prompt))
+
+        response = await self._generate(self._tokens(prompt), min(self._tokens(content), num_predict))
+        response.update(model=body.get("model", ""), message={"role": "assistant", "content": content})
+        return web.json_response(response)
+
+
+    async def _embed(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        inputs = body.get("input") or []
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+
+        response = await self._generate(sum(self._tokens(text) for text in inputs), 0)
+        embeddings = []
+        for text in inputs:
+            rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+            vector = [rng.gauss(0, 1) for _ in range(self.embedding_dim)]
+            norm = sum(x * x for x in vector) ** 0.5
+            embeddings.append([x / norm for x in vector])
+        response.update(model=body.get("model", ""), embeddings=embeddings)
+        return web.json_response(response)
+
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, returns the base url (a free port is picked when port is 0)."""
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/api/chat", self._chat)
+        app.router.add_post("/api/embed", self._embed)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,36 @@
+from tools.logger import Logger
+from tools.webCrawler import WebCrawler
+from tools.DataClass import CrawledJob
+
+import argparse
+import asyncio
+import json
+
+
+# record real job pages once, the benchmark then replays them without network access.
+async def record(keyword: str, pages: int, limit: int, output: str) -> None:
+    logger = Logger(__name__).get_logger()
+    async with WebCrawler(logger=logger) as crawler:
+        job_links = await crawler.crawl_job_links(keyword=keyword, total_pages=pages)
+        fixtures = []
+        async for result in crawler.stream_job_pages(urls=list(dict.fromkeys(job_links))[:limit]):
+            if result.success:
+                fixtures.append(CrawledJob(url=result.url, markdown=str(result.markdown or ""), html=result.html).model_dump())
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, indent=2, ensure_ascii=False)
+    print(f"Recorded {len(fixtures)} job pages to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record crawled job pages as benchmark fixtures.")
+    parser.add_argument("keyword", help="search keyword, e.g. data-engineer")
+    parser.add_argument("-p", "--pages", type=int, default=1, help="search pages to crawl")
+    parser.add_argument("-n", "--limit", type=int, default=50, help="max job pages to record")
+    parser.add_argument("-o", "--output", default="benchmarks/fixtures/job_pages.json")
+    args = parser.parse_args()
+    asyncio.run(record(args.keyword.replace(" ", "-"), args.pages, args.limit, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+from benchmarks.FakeOllamaServer import FakeOllamaServer
+from tools.DataClass import CrawledJob, JobInfo
+from tools.OllamaSummarizer import OllamaSummarizer
+from tools.DBHandler import DBHandler
+from tools.Metrics import Metrics, metrics
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+
+
+# every benchmark row is stored under this keyword with a bench-* id, and deleted afterwards.
+KEYWORD = "benchmark"
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark: recorded job pages, fake Ollama server, local Postgres.")
+    parser.add_argument("-n", "--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="number of jobs per run")
+    parser.add_argument("--fixtures", default="benchmarks/fixtures/job_pages.json", help="recorded job pages (see record_fixtures.py)")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake ollama fixed seconds per request")
+    parser.add_argument("--prompt-rate", type=float, default=2000, help="fake ollama prompt tokens/sec")
+    parser.add_argument("--eval-rate", type=float, default=200, help="fake ollama generated tokens/sec")
+    parser.add_argument("--parallel", type=int, default=4, help="requests the fake ollama serves at once")
+    parser.add_argument(
+        "--db", choices=["pgserver", "env", "none"], default="pgserver",
+        help="pgserver: throwaway in-process postgres (pip install pgserver), env: database from .env, none: skip the db stage",
+    )
+    parser.add_argument("-o", "--output", default="benchmarks/results/", help="folder for the json results")
+    return parser.parse_args()
+
+
+def load_jobs(path: str, n: int) -> list[CrawledJob]:
+    # cycle the recorded pages with unique ids and text, so no cache or upsert conflict hides work.
+    with open(path, encoding="utf-8") as f:
+        fixtures = [CrawledJob.model_validate(page) for page in json.load(f)]
+    return [
+        CrawledJob(
+            url=f"https://hk.jobsdb.com/job/bench-{i}?type=standard",
+            markdown=f"{fixtures[i % len(fixtures)].markdown}\n\nReference no. bench-{i}",
+            html=fixtures[i % len(fixtures)].html,
+        )
+        for i in range(n)
+    ]
+
+
+def start_database(mode: str, tmp_dir: str) -> None:
+    if mode != "pgserver":
+        return
+    import pgserver     # optional, only for benchmarks
+    info = pgserver.get_server(tmp_dir, cleanup_mode="stop").get_postmaster_info()
+    os.environ.update(
+        username="postgres", password="postgres", host=str(info.socket_dir), port=str(info.port), db_name="postgres"
+    )
+
+
+def stage_stats(name: str, jobs: int, wall: float, timings: dict) -> dict:
+    return {
+        "stage": name,
+        "jobs": jobs,
+        "wall_seconds": round(wall, 3),
+        "jobs_per_sec": round(jobs / max(wall, 1e-9), 2),
+        "p50_seconds": timings.get("p50_seconds", 0.0),
+        "p95_seconds": timings.get("p95_seconds", 0.0),
+    }
+
+
+async def bench_extraction(logger, crawled: list[CrawledJob]) -> tuple[dict, list[JobInfo]]:
+    # a fresh summarizer per size, so the adaptive limiter starts from the same state.
+    summarizer = OllamaSummarizer(logger=logger)
+    timer = Metrics()
+    # a bounded worker pool sized like JobPipeline's extract stage, not one task per job.
+    workers = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "8")) * len(summarizer.client.endpoints)
+    pending = asyncio.Queue()
+    for job in crawled:
+        pending.put_nowait(job)
+
+    async def extract() -> list[JobInfo | None]:
+        job_infos = []
+        while not pending.empty():
+            job = pending.get_nowait()
+            with timer.timer("job"):
+                job_infos.append(await summarizer.summarize_job(result=job, keyword=KEYWORD))
+        return job_infos
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(extract() for _ in range(workers)))
+    wall = time.perf_counter() - start
+    summarizer.close()
+
+    job_infos = [job_info for job_infos in results for job_info in job_infos if job_info is not None]
+    return stage_stats("extract", len(job_infos), wall, timer.summary()["timings"].get("job", {})), job_infos
+
+
+def cleanup(dbhandler: DBHandler) -> None:
+    # the job ads, their compressed content unless a real ad shares it, and the keyword's term counts.
+    with dbhandler.pool.connection() as conn:
+        conn.autocommit = False
+        with conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH deleted AS (DELETE FROM JobAd WHERE id LIKE 'bench-%' RETURNING content_hash)
+                DELETE FROM job_content c
+                USING deleted d
+                WHERE c.hash = d.content_hash
+                  AND NOT EXISTS (SELECT 1 FROM JobAd j WHERE j.content_hash = c.hash AND j.id NOT LIKE 'bench-%')
+                """
+            )
+            cur.execute("DELETE FROM job_term_counts WHERE keyword = %s", (KEYWORD,))
+
+
+def bench_persist(logger, job_infos: list[JobInfo]) -> dict:
+    dbhandler = DBHandler(logger=logger)
+    timer = Metrics()
+
+    start = time.perf_counter()
+    stored = 0
+    for i in range(0, len(job_infos), dbhandler.batch_size):
+        with timer.timer("batch"):
+            stored += len(dbhandler.insert_jobs(job_infos[i:i + dbhandler.batch_size]))
+    wall = time.perf_counter() - start
+
+    cleanup(dbhandler)
+    dbhandler.close()
+
+    stats = stage_stats("persist", stored, wall, timer.summary()["timings"].get("batch", {}))
+    stats["batch_size"] = dbhandler.batch_size
+    return stats
+
+
+async def run(args: argparse.Namespace) -> None:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+    logger = logging.getLogger("benchmark")
+
+    server = FakeOllamaServer(latency=args.latency, prompt_rate=args.prompt_rate, eval_rate=args.eval_rate, parallel=args.parallel)
+    os.environ["OLLAMA_HOSTS"] = await server.start()
+    os.environ.setdefault("OLLAMA_EXTRACTION_MODEL", "benchmark")
+    # every job must reach the (fake) model.
+    os.environ["EXTRACTION_CACHE"] = "false"
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.db != "none":
+            start_database(args.db, tmp_dir)
+        for n in args.sizes:
+            metrics.reset()
+            crawled = load_jobs(args.fixtures, n)
+            extract_stats, job_infos = await bench_extraction(logger, crawled)
+            # per request model time, without the wait for a limiter slot that extract includes.
+            llm = metrics.summary()["timings"].get("llm_request", {})
+            stages = [extract_stats, stage_stats("llm", llm.get("count", 0), extract_stats["wall_seconds"], llm)]
+            if args.db != "none":
+                stages.append(await asyncio.to_thread(bench_persist, logger, job_infos))
+            # token counts and cache rates recorded by the components themselves.
+            results.append({"n": n, "stages": stages, "metrics": metrics.summary()})
+            for stage in stages:
+                print(
+                    f"N={n:>6} {stage['stage']:<8} {stage['jobs']:>6} jobs in {stage['wall_seconds']:>8.2f}s "
+                    f"{stage['jobs_per_sec']:>9.2f} jobs/s  p50={stage['p50_seconds']:.4f}s  p95={stage['p95_seconds']:.4f}s"
+                )
+    await server.stop()
+
+    os.makedirs(args.output, exist_ok=True)
+    filepath = os.path.join(args.output, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "settings": vars(args),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {filepath}")
+
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,143 @@
 from tools.logger import Logger
 from tools.webCrawler import WebCrawler
 from tools.OllamaSummarizer import OllamaSummarizer
-from old.EmbeddingGenerator import EmbeddingGenerator
+from tools.EmbeddingGenerator import EmbeddingGenerator
+from tools.NearDuplicateIndex import NearDuplicateIndex
+from tools.TermCanonicalizer import TermCanonicalizer
 from tools.DBHandler import DBHandler
+from tools.DBPool import DBPool
 from tools.OllamaResearcher import OllamaResearcher
+from tools.JobPipeline import JobPipeline
+from tools.JobQueue import JobQueue
+from tools.Metrics import metrics
 
 from pprint import pformat
 import os
+import argparse
 import asyncio
 from dotenv import load_dotenv
 load_dotenv()
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Crawl, extract and report on job ads for one or more keywords.")
+    parser.add_argument("keywords", nargs="*", help="keywords to process in batch mode (interactive when none given)")
+    parser.add_argument("-f", "--keywords-file", help="file with one keyword per line, '#' starts a comment")
+    parser.add_argument("-p", "--pages", type=int, default=int(os.getenv("SEARCH_PAGES", "3")), help="search pages per keyword")
+    return parser.parse_args()
+
+
+def load_keywords(args: argparse.Namespace) -> list[str]:
+    keywords = list(args.keywords)
+    if args.keywords_file:
+        with open(args.keywords_file, encoding="utf-8") as f:
+            keywords += [line.split("#", 1)[0].strip() for line in f]
+    # must convert query to a string in format "text-text-text" before searching.
+    keywords = [keyword.replace(" ", "-") for keyword in keywords if keyword]
+    return list(dict.fromkeys(keywords))
+
+
+async def run_batch(logger, keywords: list[str], total_pages: int, pipeline: JobPipeline, researcher: OllamaResearcher) -> None:
+    # all keywords share the crawler session, llm limiter and db pool, so the limits hold globally.
+    semaphore = asyncio.Semaphore(int(os.getenv("PIPELINE_KEYWORD_CONCURRENCY", "4")))
+
+    async def run_keyword(keyword: str) -> None:
+        async with semaphore:
+            await pipeline.run(keyword=keyword, total_pages=total_pages)
+
+    results = await asyncio.gather(*(run_keyword(keyword) for keyword in keywords), return_exceptions=True)
+    for keyword, result in zip(keywords, results):
+        if isinstance(result, Exception):
+            logger.error(f"Pipeline failed for keyword '{keyword}': {result}")
+
+    # reports only read the term counts, generate them in parallel once every keyword is stored.
+    async def report(keyword: str) -> None:
+        async with semaphore:
+            await researcher.generate_job_market_report(keyword=keyword)
+
+    results = await asyncio.gather(*(report(keyword) for keyword in keywords), return_exceptions=True)
+    for keyword, result in zip(keywords, results):
+        if isinstance(result, Exception):
+            logger.error(f"Report failed for keyword '{keyword}': {result}")
+    logger.info(f"Batch finished for {len(keywords)} keywords.")
+
+
 # main program.
-def main():
+async def run(args: argparse.Namespace):
     # initiate classes.
     logger = Logger(__name__).get_logger()
     crawler = WebCrawler(logger=logger)
     summarizer = OllamaSummarizer(logger=logger)
-    dbhandler = DBHandler(logger=logger)
-    researcher = OllamaResearcher(logger=logger)
+    pool = DBPool(logger=logger)
+    dbhandler = DBHandler(logger=logger, pool=pool)
+    researcher = OllamaResearcher(logger=logger, pool=pool)
+    queue = JobQueue(logger=logger, pool=pool)
+    embedder = EmbeddingGenerator(logger=logger, pool=pool)
+    canonicalizer = TermCanonicalizer(logger=logger, pool=pool)
+    dedup = NearDuplicateIndex(logger=logger, pool=pool) if os.getenv("NEAR_DUP_DETECTION", "true").lower() == "true" else None
+    pipeline = JobPipeline(
+        logger=logger,
+        crawler=crawler,
+        summarizer=summarizer,
+        dbhandler=dbhandler,
+        queue=queue,
+        embedder=embedder,
+        dedup=dedup,
+        canonicalizer=canonicalizer
+    )
+    
+    # optional prometheus scrape endpoint, the json run summary is always written.
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        await metrics.start_server(port=int(metrics_port))
+        logger.info(f"Metrics served on port {metrics_port}.")
+
+    try:
+        # jobs stored before canonicalization and embedding existed, a no-op once done.
+        await asyncio.to_thread(canonicalizer.backfill)
+        await embedder.embed_missing()
     
-    # chat loop.
-    while True:
-        query = input("Enter your keyword to search jobs (or type 'q' for quit): ")
-        
-        if query.lower() == 'q':
-            logger.info("User exited the application.")
-            break
-        total_search_pages = input("How many search pages to crawl? ")
-        # must convert query to a string in format "text-text-text" before searching.
-        keyword = query.replace(" ", "-")
-        
-        # crawl all job pages based on the keyword and save the extracted results to the postgresql database.
-        job_results = crawler.crawl_all_job_pages(
-            keyword=keyword, 
-            total_pages=int(total_search_pages)
-        )
-        
-        # Extract information from job ads.
-        job_infos = asyncio.run(summarizer.summarize_all_jobs(results=job_results, keyword=keyword))
-
-        # save data to postgresql.
-        for job in job_infos:
-            dbhandler.insert_job(job_item=job)
-        
-        # generate report.
-        researcher.generate_job_market_report(keyword=keyword)
+        # one event loop and one browser session for every keyword.
+        async with crawler:
+            keywords = load_keywords(args)
+            if keywords:
+                await run_batch(logger, keywords, args.pages, pipeline, researcher)
+            else:
+                # chat loop.
+                while True:
+                    query = await asyncio.to_thread(input, "Enter your keyword to search jobs (or type 'q' for quit): ")
+            
+                    if query.lower() == 'q':
+                        logger.info("User exited the application.")
+                        break
+                    total_search_pages = await asyncio.to_thread(input, "How many search pages to crawl? ")
+                    # must convert query to a string in format "text-text-text" before searching.
+                    keyword = query.replace(" ", "-")
+            
+                    # crawl, extract and save job ads to the postgresql database as a streaming pipeline.
+                    await pipeline.run(
+                        keyword=keyword,
+                        total_pages=int(total_search_pages)
+                    )
+            
+                    # generate report, streamed to the console as it is written.
+                    await researcher.generate_job_market_report(keyword=keyword, echo=True)
+    finally:
+        # release resources, also after a failure or Ctrl-C.
+        await metrics.stop_server()
+        logger.info(f"Run summary written to {metrics.write_summary()}")
+        summarizer.close()
+        dbhandler.close()
+        researcher.close()
+        pool.close()
        
     return
 
+
+def main():
+    asyncio.run(run(parse_args()))
+
+
 # main program entry point.
 if __name__ == "__main__":
     main()
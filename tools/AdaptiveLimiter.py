@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class _Sample:
+    """Per-request measurements, filled in by the caller from the Ollama response."""
+    def __init__(self, generation: int, concurrency: int):
+        self.start = time.monotonic()
+        self.generation = generation        # limit changes seen when the request started
+        self.concurrency = concurrency      # in-flight requests including this one
+        self.eval_count = 0
+        self.eval_duration = 0      # nanoseconds, as reported by ollama
+
+    def observe(self, response) -> None:
+        self.eval_count = response.get("eval_count") or 0
+        self.eval_duration = response.get("eval_duration") or 0
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limiter for LLM requests.
+
+    After every window of completed requests the aggregate throughput (generated tokens/sec
+    across all in-flight requests, estimated as concurrency x per-request token rate) is
+    compared with the previous window. Only requests started under the current limit count,
+    so a change is judged on its own effect:
+    - throughput improved          -> additive increase (+1 slot)
+    - throughput dropped after a step up, or a request failed -> multiplicative decrease
+    - no gain after a step up      -> undo the step
+    - plateau                      -> hold, probing +1 again after a few windows
+    Callers that wait for capacity themselves (OllamaBalancer, one limiter per endpoint) use
+    available() / start() / finish() instead of slot().
+    """
+    def __init__(self, logger, name: str = "ollama", max_limit: int | None = None):
+        self.logger = logger
+        self.name = name
+        self.min_limit = int(os.getenv("OLLAMA_MIN_CONCURRENCY", "1"))
+        self.max_limit = max_limit or int(os.getenv("OLLAMA_MAX_CONCURRENCY", "8"))
+        self.limit = min(max(int(os.getenv("OLLAMA_INITIAL_CONCURRENCY", "2")), self.min_limit), self.max_limit)
+        self.decrease_factor = 0.5
+        self.tolerance = 0.05
+        self.probe_after = 3
+
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+        # current measurement window.
+        self._generation = 0
+        self._window_requests = 0
+        self._window_tokens = 0
+        self._window_eval_duration = 0
+        self._window_latency = 0.0
+        self._window_rate = 0.0
+        self._window_errors = 0
+
+        self._last_throughput = None
+        self._last_action = None
+        self._holds = 0
+
+        self.logger.info(
+            f"{AdaptiveLimiter.__name__} for {self.name} initiated "
+            f"(limit={self.limit}, min={self.min_limit}, max={self.max_limit})."
+        )
+
+
+    def available(self) -> bool:
+        return self.in_flight < self.limit
+
+
+    def start(self) -> _Sample:
+        """Take a slot without waiting, the caller checked available()."""
+        self.in_flight += 1
+        return _Sample(generation=self._generation, concurrency=self.in_flight)
+
+
+    def finish(self, sample: _Sample, failed: bool) -> None:
+        # record before releasing so waiters see a freshly raised limit.
+        self._record(sample, failed)
+        self.in_flight -= 1
+
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one in-flight slot. Call sample.observe(response) to report token metrics."""
+        async with self._cond:
+            await self._cond.wait_for(self.available)
+            sample = self.start()
+
+        failed = False
+        try:
+            yield sample
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.finish(sample, failed)
+            async with self._cond:
+                # only as many waiters as there are free slots, waking all of them is quadratic.
+                self._cond.notify(max(self.limit - self.in_flight, 0))
+
+
+    def _record(self, sample: _Sample, failed: bool) -> None:
+        if sample.generation != self._generation and not failed:
+            return
+        latency = max(time.monotonic() - sample.start, 1e-6)
+        self._window_requests += 1
+        self._window_latency += latency
+        self._window_rate += sample.concurrency * sample.eval_count / latency
+        self._window_tokens += sample.eval_count
+        self._window_eval_duration += sample.eval_duration
+        self._window_errors += int(failed)
+
+        if self._window_requests >= max(self.limit, 4):
+            self._adjust()
+
+
+    def _adjust(self) -> None:
+        throughput = self._window_rate / self._window_requests
+        avg_latency = self._window_latency / self._window_requests
+        # per-request decode speed reported by the model server itself.
+        decode_speed = self._window_tokens / (self._window_eval_duration / 1e9) if self._window_eval_duration else 0.0
+        old_limit = self.limit
+
+        if self._window_errors:
+            action = "decrease"
+        elif self._last_throughput is None or throughput > self._last_throughput * (1 + self.tolerance):
+            action = "increase"
+        elif self._last_action == "increase":
+            # the extra slot did not pay off: back off hard if it hurt, otherwise undo the step.
+            action = "decrease" if throughput < self._last_throughput * (1 - self.tolerance) else "revert"
+        elif self._holds >= self.probe_after:
+            action = "increase"
+        else:
+            action = "hold"
+
+        if action == "increase":
+            self.limit = min(self.limit + 1, self.max_limit)
+        elif action == "decrease":
+            self.limit = max(int(self.limit * self.decrease_factor), self.min_limit)
+        elif action == "revert":
+            self.limit = max(self.limit - 1, self.min_limit)
+        self._holds = self._holds + 1 if action == "hold" else 0
+
+        self.logger.info(
+            f"{self.name} concurrency {old_limit} -> {self.limit} ({action}): "
+            f"{throughput:.1f} tokens/sec aggregate, {decode_speed:.1f} tokens/sec per request, "
+            f"avg latency {avg_latency:.1f}s, "
+            f"{self._window_errors} errors over {self._window_requests} requests."
+        )
+
+        self._last_throughput = throughput
+        self._last_action = action
+        self._generation += 1
+        self._window_requests = 0
+        self._window_tokens = 0
+        self._window_eval_duration = 0
+        self._window_latency = 0.0
+        self._window_rate = 0.0
+        self._window_errors = 0
@@ -0,0 +1,103 @@
+import psycopg2
+import psycopg2.extras
+
+import hashlib
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tools.DBPool import DBPool
+
+# zstd when installed (faster, smaller), zlib from the standard library otherwise.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class ContentStore:
+    """
+    Content-addressed store of raw job ad markdown, compressed, in table job_content.
+
+    JobAd only keeps the sha256 of its content (content_hash), so the table the reports and
+    lookups scan stays small, and identical pages are stored once. Every row records its codec,
+    so zstd and zlib rows can be mixed. Content is only loaded when asked for with get().
+    """
+    def __init__(self, logger, pool: DBPool):
+        self.logger = logger
+        self.pool = pool
+        self.codec = "zstd" if zstandard is not None else "zlib"
+
+        self.create_table()
+        self.logger.info(f"{ContentStore.__name__} initiated (codec={self.codec}).")
+
+
+    def create_table(self) -> None:
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS job_content (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,                  -- uncompressed bytes
+            data BYTEA NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(create_table_query)
+            self.logger.info("Table job_content created (or already exists)")
+        except Exception as e:
+            self.logger.error(f"Failed to create job_content: {e}")
+            raise
+
+
+    @staticmethod
+    def hash_of(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+    def _compress(self, raw: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(raw)
+        return zlib.compress(raw, 6)
+
+
+    @staticmethod
+    def _decompress(codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("content was stored with zstd, install zstandard to read it")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+
+    def put_many(self, contents: list[str]) -> list[str]:
+        """Store contents (already stored ones are skipped) and return their hashes, in order."""
+        hashes = [self.hash_of(content) for content in contents]
+        rows = {}
+        for content_hash, content in zip(hashes, contents):
+            if content_hash not in rows:
+                raw = content.encode("utf-8")
+                rows[content_hash] = (content_hash, self.codec, len(raw), psycopg2.Binary(self._compress(raw)))
+        if rows:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                psycopg2.extras.execute_values(
+                    cur,
+                    "INSERT INTO job_content (hash, codec, size, data) VALUES %s ON CONFLICT (hash) DO NOTHING",
+                    list(rows.values()),
+                )
+        return hashes
+
+
+    def put(self, content: str) -> str:
+        return self.put_many([content])[0]
+
+
+    def get(self, content_hash: str) -> str | None:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT codec, data FROM job_content WHERE hash = %s", (content_hash,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        return self._decompress(row[0], bytes(row[1])).decode("utf-8")
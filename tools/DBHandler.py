@@ -1,30 +1,54 @@
 import psycopg2
 import psycopg2.extras
 import os
+import time
 from dotenv import load_dotenv
 from pprint import pformat
 
 load_dotenv()
 
 from tools.DataClass import JobInfo
+from tools.DBPool import DBPool
+from tools.ContentStore import ContentStore
+from tools.Metrics import metrics
+
+# shared by every JobAd upsert. cluster_id is only inserted for near-duplicates, so it is
+# cleared when an ad is stored with its own extraction.
+UPSERT_CLAUSE = """
+        ON CONFLICT (id) DO UPDATE SET
+            url = EXCLUDED.url,
+            content_hash = COALESCE(EXCLUDED.content_hash, JobAd.content_hash),
+            content = NULL,
+            keyword = EXCLUDED.keyword,
+            keywords = ARRAY(
+                SELECT DISTINCT unnest(COALESCE(JobAd.keywords, '{}') || EXCLUDED.keywords) ORDER BY 1
+            ),
+            cluster_id = EXCLUDED.cluster_id,
+            job_title = EXCLUDED.job_title,
+            company = EXCLUDED.company,
+            responsibilities = EXCLUDED.responsibilities,
+            qualifications = EXCLUDED.qualifications,
+            experiences = EXCLUDED.experiences,
+            skills = EXCLUDED.skills,
+            salary = EXCLUDED.salary,
+            working_location = EXCLUDED.working_location,
+            skills_canonical = EXCLUDED.skills_canonical,
+            qualifications_canonical = EXCLUDED.qualifications_canonical,
+            experiences_canonical = EXCLUDED.experiences_canonical,
+            updated_at = NOW()
+        RETURNING id;
+"""
 
 class DBHandler:
-    def __init__(self, logger):
+    def __init__(self, logger, pool: DBPool | None = None):
         self.logger = logger
-        self.username = os.getenv("username")
-        self.password = os.getenv("password")
-        self.host = os.getenv("host")
-        self.port = os.getenv("port")
-        self.db_name = os.getenv("db_name")
-
-        if not all([self.username, self.password, self.host, self.port, self.db_name]):
-            raise ValueError("Missing database credentials in .env file")
-
-        self.postgres_url = f"postgresql://{self.username}:{self.password}@{self.host}:{self.port}/{self.db_name}"
-        
-        # Create persistent connection with autocommit
-        self.conn = psycopg2.connect(self.postgres_url)
-        self.conn.autocommit = True
+        # borrow connections from a shared pool, create a private one when used standalone.
+        self._owns_pool = pool is None
+        self.pool = pool or DBPool(logger=logger)
+        self.db_name = self.pool.db_name
+        self.batch_size = int(os.getenv("DB_BATCH_SIZE", "1000"))
+        # raw markdown lives compressed in job_content, JobAd only references it by hash.
+        self.content_store = ContentStore(logger=logger, pool=self.pool)
         
         self.logger.info(f"DBHandler initialized and connected to {self.db_name}")
         self.create_table()
@@ -34,8 +58,10 @@ class DBHandler:
         CREATE TABLE IF NOT EXISTS JobAd (
             id TEXT PRIMARY KEY,                    -- Changed from SERIAL
             url TEXT NOT NULL,
-            content TEXT,
-            keyword TEXT,
+            content TEXT,                           -- legacy inline content, moved to job_content by migrate_content
+            content_hash TEXT,                      -- sha256 of the raw markdown in job_content
+            keyword TEXT,                           -- keyword the job was last crawled for
+            keywords TEXT[],                        -- every keyword the job was found under
             job_title TEXT,
             company TEXT,
             responsibilities TEXT[],
@@ -44,48 +70,226 @@ class DBHandler:
             skills TEXT[],
             salary TEXT,
             working_location TEXT,
+            skills_canonical TEXT[],                -- canonical forms of the raw arrays, see TermCanonicalizer
+            qualifications_canonical TEXT[],
+            experiences_canonical TEXT[],
+            cluster_id TEXT,                        -- representative job of a near-duplicate cluster, NULL for representatives
             created_at TIMESTAMPTZ DEFAULT NOW(),
             updated_at TIMESTAMPTZ DEFAULT NOW()
         );
+        ALTER TABLE JobAd ADD COLUMN IF NOT EXISTS cluster_id TEXT;
+        ALTER TABLE JobAd ADD COLUMN IF NOT EXISTS content_hash TEXT;
+        ALTER TABLE JobAd ADD COLUMN IF NOT EXISTS skills_canonical TEXT[];
+        ALTER TABLE JobAd ADD COLUMN IF NOT EXISTS qualifications_canonical TEXT[];
+        ALTER TABLE JobAd ADD COLUMN IF NOT EXISTS experiences_canonical TEXT[];
+        CREATE INDEX IF NOT EXISTS idx_jobad_keyword ON JobAd (keyword);
+        CREATE INDEX IF NOT EXISTS idx_jobad_cluster_id ON JobAd (cluster_id);
+        CREATE INDEX IF NOT EXISTS idx_jobad_skills ON JobAd USING GIN (skills);
+        CREATE INDEX IF NOT EXISTS idx_jobad_responsibilities ON JobAd USING GIN (responsibilities);
+        CREATE INDEX IF NOT EXISTS idx_jobad_qualifications ON JobAd USING GIN (qualifications);
+        CREATE INDEX IF NOT EXISTS idx_jobad_experiences ON JobAd USING GIN (experiences);
         """
         try:
-            with self.conn.cursor() as cur:
+            with self.pool.connection() as conn, conn.cursor() as cur:
                 cur.execute(create_table_query)
-            self.logger.info("Table JobAd created (or already exists)")
+            self.logger.info("Table JobAd and indexes created (or already exist)")
         except Exception as e:
             self.logger.error(f"Failed to create table: {e}")
             raise
 
-    def insert_job(self, job_item: JobInfo) -> str | None:
-        """Insert or update a job. Returns the job id on success."""
-        insert_query = """
-        INSERT INTO JobAd (
-            id, url, content, keyword, job_title, company,
-            responsibilities, qualifications, experiences,
-            skills, salary, working_location
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (id) DO UPDATE SET
-            url = EXCLUDED.url,
-            content = EXCLUDED.content,
-            keyword = EXCLUDED.keyword,
-            job_title = EXCLUDED.job_title,
-            company = EXCLUDED.company,
-            responsibilities = EXCLUDED.responsibilities,
-            qualifications = EXCLUDED.qualifications,
-            experiences = EXCLUDED.experiences,
-            skills = EXCLUDED.skills,
-            salary = EXCLUDED.salary,
-            working_location = EXCLUDED.working_location,
-            updated_at = NOW()
-        RETURNING id;
+        # must run before create_term_counts_table switches the counts to keyword arrays.
+        self.migrate_keywords()
+        self.create_term_counts_table()
+        self.migrate_content()
+
+    def migrate_content(self, batch_size: int = 1000) -> None:
+        """Move inline JobAd.content of rows stored before the ContentStore existed into job_content."""
+        select_query = "SELECT id, content FROM JobAd WHERE content IS NOT NULL LIMIT %s"
+        update_query = """
+        UPDATE JobAd j SET content_hash = v.content_hash, content = NULL
+        FROM (VALUES %s) AS v(id, content_hash)
+        WHERE j.id = v.id;
         """
+        total = 0
+        while True:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(select_query, (batch_size,))
+                rows = cur.fetchall()
+            if not rows:
+                break
+            hashes = self.content_store.put_many([content for _, content in rows])
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                psycopg2.extras.execute_values(cur, update_query, [(row[0], h) for row, h in zip(rows, hashes)])
+            total += len(rows)
+        if total:
+            self.logger.info(f"Moved the content of {total} JobAd rows to job_content")
 
-        values = (
+    def _store_content(self, job_items: list[JobInfo]) -> None:
+        # store the markdown once, then drop it from the items so it isn't held until the end of the run.
+        items = [job_item for job_item in job_items if job_item.content is not None]
+        if not items:
+            return
+        hashes = self.content_store.put_many([job_item.content for job_item in items])
+        for job_item, content_hash in zip(items, hashes):
+            job_item.content_hash = content_hash
+            job_item.content = None
+
+    def get_job_content(self, job_id: str) -> str | None:
+        """Raw markdown of a stored job, loaded from job_content only when asked for."""
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT content_hash, content FROM JobAd WHERE id = %s", (job_id,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        content_hash, content = row
+        if content is not None:
+            return content
+        return self.content_store.get(content_hash) if content_hash else None
+
+    def migrate_keywords(self) -> None:
+        """Add the keywords array to tables created before multi-keyword runs and fill it from keyword."""
+        migrate_query = """
+        ALTER TABLE JobAd ADD COLUMN IF NOT EXISTS keywords TEXT[];
+        CREATE INDEX IF NOT EXISTS idx_jobad_keywords ON JobAd USING GIN (keywords);
+        UPDATE JobAd SET keywords = ARRAY[keyword] WHERE keywords IS NULL AND keyword IS NOT NULL;
+        """
+        with self.pool.connection() as conn:
+            conn.autocommit = False
+            with conn, conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(hashtext('job_term_counts'))")
+                cur.execute(migrate_query)
+                if cur.rowcount > 0:
+                    self.logger.info(f"Migrated {cur.rowcount} JobAd rows to the keywords array")
+
+    def create_term_counts_table(self) -> None:
+        """
+        Create job_term_counts, the per-keyword frequency of every job title and array term,
+        kept up to date by statement-level triggers on JobAd (old arrays subtracted, new ones added).
+        """
+        create_query = """
+        CREATE TABLE IF NOT EXISTS job_term_counts (
+            keyword TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            term TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (keyword, column_name, term)
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_term_counts_top
+            ON job_term_counts (keyword, column_name, count DESC);
+
+        -- every (keyword, column, term) a JobAd row contributes to the counts, once per keyword it was found under.
+        -- near-duplicates (cluster_id set to another job) don't count, so the counts are per distinct ad.
+        -- skills, qualifications and experiences are counted by canonical term when available.
+        CREATE OR REPLACE FUNCTION jobad_terms(r JobAd)
+        RETURNS TABLE (keyword TEXT, column_name TEXT, term TEXT)
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT k.keyword, v.column_name, t.term
+            FROM unnest(r.keywords) AS k(keyword),
+            (VALUES
+                ('job_title', ARRAY[r.job_title]),
+                ('skills', COALESCE(r.skills_canonical, r.skills)),
+                ('responsibilities', r.responsibilities),
+                ('qualifications', COALESCE(r.qualifications_canonical, r.qualifications)),
+                ('experiences', COALESCE(r.experiences_canonical, r.experiences))
+            ) AS v(column_name, terms),
+            LATERAL unnest(v.terms) AS t(term)
+            WHERE COALESCE(r.cluster_id, r.id) = r.id
+              AND k.keyword IS NOT NULL AND t.term IS NOT NULL AND TRIM(t.term) != ''
+        $$;
+
+        CREATE OR REPLACE FUNCTION job_term_counts_sync()
+        RETURNS TRIGGER LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO job_term_counts (keyword, column_name, term, count)
+                SELECT t.keyword, t.column_name, t.term, COUNT(*)
+                FROM new_rows n, LATERAL jobad_terms(n) t
+                GROUP BY 1, 2, 3
+                ORDER BY 1, 2, 3
+                ON CONFLICT (keyword, column_name, term)
+                DO UPDATE SET count = job_term_counts.count + EXCLUDED.count;
+            ELSIF TG_OP = 'UPDATE' THEN
+                INSERT INTO job_term_counts (keyword, column_name, term, count)
+                SELECT keyword, column_name, term, SUM(delta)
+                FROM (
+                    SELECT t.*, -1 AS delta FROM old_rows o, LATERAL jobad_terms(o) t
+                    UNION ALL
+                    SELECT t.*, 1 AS delta FROM new_rows n, LATERAL jobad_terms(n) t
+                ) d
+                GROUP BY 1, 2, 3
+                HAVING SUM(delta) != 0
+                ORDER BY 1, 2, 3
+                ON CONFLICT (keyword, column_name, term)
+                DO UPDATE SET count = job_term_counts.count + EXCLUDED.count;
+            ELSE
+                UPDATE job_term_counts c
+                SET count = c.count - d.count
+                FROM (
+                    SELECT t.keyword, t.column_name, t.term, COUNT(*) AS count
+                    FROM old_rows o, LATERAL jobad_terms(o) t
+                    GROUP BY 1, 2, 3
+                ) d
+                WHERE c.keyword = d.keyword AND c.column_name = d.column_name AND c.term = d.term;
+            END IF;
+            RETURN NULL;
+        END;
+        $$;
+
+        DROP TRIGGER IF EXISTS jobad_term_counts_insert ON JobAd;
+        CREATE TRIGGER jobad_term_counts_insert AFTER INSERT ON JobAd
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION job_term_counts_sync();
+        DROP TRIGGER IF EXISTS jobad_term_counts_update ON JobAd;
+        CREATE TRIGGER jobad_term_counts_update AFTER UPDATE ON JobAd
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION job_term_counts_sync();
+        DROP TRIGGER IF EXISTS jobad_term_counts_delete ON JobAd;
+        CREATE TRIGGER jobad_term_counts_delete AFTER DELETE ON JobAd
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION job_term_counts_sync();
+        """
+        try:
+            with self.pool.connection() as conn:
+                conn.autocommit = False
+                with conn, conn.cursor() as cur:
+                    # serialize concurrent startups replacing the triggers.
+                    cur.execute("SELECT pg_advisory_xact_lock(hashtext('job_term_counts'))")
+                    cur.execute(create_query)
+                    cur.execute("SELECT NOT EXISTS (SELECT 1 FROM job_term_counts) AND EXISTS (SELECT 1 FROM JobAd)")
+                    needs_backfill = cur.fetchone()[0]
+            self.logger.info("Table job_term_counts and triggers created (or already exist)")
+        except Exception as e:
+            self.logger.error(f"Failed to create job_term_counts: {e}")
+            raise
+
+        if needs_backfill:
+            self.rebuild_term_counts()
+
+    def rebuild_term_counts(self) -> None:
+        """Recount job_term_counts from scratch, e.g. after a bulk load with triggers disabled."""
+        rebuild_query = """
+        LOCK TABLE job_term_counts IN EXCLUSIVE MODE;
+        TRUNCATE job_term_counts;
+        INSERT INTO job_term_counts (keyword, column_name, term, count)
+        SELECT t.keyword, t.column_name, t.term, COUNT(*)
+        FROM JobAd j, LATERAL jobad_terms(j) t
+        GROUP BY 1, 2, 3;
+        """
+        with self.pool.connection() as conn:
+            conn.autocommit = False
+            with conn, conn.cursor() as cur:
+                cur.execute(rebuild_query)
+        self.logger.info("Table job_term_counts rebuilt from JobAd")
+
+    @staticmethod
+    def _job_values(job_item: JobInfo, keywords: list[str] | None = None) -> tuple:
+        canonical = job_item.canonical_terms or {}
+        return (
             job_item.id,
             job_item.url,
-            job_item.content,
+            job_item.content_hash,
             job_item.keyword,
+            keywords or [job_item.keyword],
             job_item.job_info.job_title,
             job_item.job_info.company,
             job_item.job_info.responsibilities,
@@ -94,31 +298,179 @@ class DBHandler:
             job_item.job_info.skills,
             job_item.job_info.salary,
             job_item.job_info.working_location,
+            canonical.get("skills"),
+            canonical.get("qualifications"),
+            canonical.get("experiences"),
+        )
+
+    def insert_job(self, job_item: JobInfo) -> str | None:
+        """Insert or update a job. Returns the job id on success."""
+        inserted_ids = self.insert_jobs([job_item])
+        return inserted_ids[0] if inserted_ids else None
+
+    def insert_jobs(self, job_items: list[JobInfo], batch_size: int | None = None) -> list[str]:
+        """Bulk insert or update jobs in a single transaction. Returns the upserted job ids."""
+        # ON CONFLICT cannot touch the same row twice in one statement, keep the last item per id
+        # and the union of the keywords it was found under.
+        unique_items = {}
+        keywords = {}
+        for job_item in job_items:
+            unique_items[job_item.id] = job_item
+            keywords.setdefault(job_item.id, set()).add(job_item.keyword)
+        if not unique_items:
+            return []
+
+        batch_size = batch_size or self.batch_size
+        insert_query = """
+        INSERT INTO JobAd (
+            id, url, content_hash, keyword, keywords, job_title, company,
+            responsibilities, qualifications, experiences,
+            skills, salary, working_location,
+            skills_canonical, qualifications_canonical, experiences_canonical
+        )
+        VALUES %s
+        """ + UPSERT_CLAUSE
+        template = (
+            "(%s, %s, %s, %s, %s::text[], %s, %s, %s::text[], %s::text[], %s::text[], %s::text[], %s, %s, "
+            "%s::text[], %s::text[], %s::text[])"
         )
 
+        start = time.perf_counter()
         try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute(insert_query, values)
-                row = cur.fetchone()
-
-                if row:
-                    inserted_id = row["id"]
-                    self.logger.debug(f"Inserted/Updated job {inserted_id}")
-                    return inserted_id
-                else:
-                    self.logger.warning(f"No row returned for job {job_item.id}")
-                    return None
+            self._store_content(list(unique_items.values()))
+            with self.pool.connection() as conn:
+                # one transaction for all pages of the batch.
+                conn.autocommit = False
+                with conn, conn.cursor() as cur:
+                    rows = psycopg2.extras.execute_values(
+                        cur,
+                        insert_query,
+                        [
+                            self._job_values(job_item, sorted(keywords[job_id]))
+                            for job_id, job_item in unique_items.items()
+                        ],
+                        template=template,
+                        page_size=batch_size,
+                        fetch=True,
+                    )
+            inserted_ids = [row[0] for row in rows]
+            metrics.observe("db_upsert", time.perf_counter() - start)
+            metrics.incr("db_rows_upserted_total", len(inserted_ids))
+            self.logger.info(f"Bulk upserted {len(inserted_ids)} jobs.")
+            return inserted_ids
 
         except Exception as e:
-            self.logger.error(f"Error inserting job {job_item.id}: {e}")
-            # Do NOT raise here if you want the pipeline to continue
-            # raise  
-            return None
+            self.logger.error(f"Error bulk inserting {len(unique_items)} jobs: {e}")
+            return []
+
+    def insert_duplicates(self, job_items: list[JobInfo], cluster_ids: dict[str, str]) -> list[str]:
+        """
+        Store near-duplicate jobs with the extraction of their cluster representative (cluster_ids maps
+        job id -> representative id). Jobs whose representative is not stored are skipped.
+        Returns the upserted job ids.
+        """
+        unique_items = {job_item.id: job_item for job_item in job_items if job_item.id in cluster_ids}
+        if not unique_items:
+            return []
+
+        insert_query = """
+        INSERT INTO JobAd (
+            id, url, content_hash, keyword, keywords, cluster_id, job_title, company,
+            responsibilities, qualifications, experiences,
+            skills, salary, working_location,
+            skills_canonical, qualifications_canonical, experiences_canonical
+        )
+        SELECT
+            v.id, v.url, v.content_hash, v.keyword, ARRAY[v.keyword], rep.id, rep.job_title, rep.company,
+            rep.responsibilities, rep.qualifications, rep.experiences,
+            rep.skills, rep.salary, rep.working_location,
+            rep.skills_canonical, rep.qualifications_canonical, rep.experiences_canonical
+        FROM (VALUES %s) AS v(id, url, content_hash, keyword, cluster_id)
+        JOIN JobAd rep ON rep.id = v.cluster_id
+        """ + UPSERT_CLAUSE
+        # the ad counts for every keyword its representative was found under.
+        keywords_query = """
+        UPDATE JobAd rep
+        SET keywords = ARRAY(SELECT DISTINCT unnest(COALESCE(rep.keywords, '{}') || dup.keywords) ORDER BY 1)
+        FROM JobAd dup
+        WHERE dup.id = ANY(%s) AND rep.id = dup.cluster_id AND NOT (dup.keywords <@ COALESCE(rep.keywords, '{}'));
+        """
+        try:
+            self._store_content(list(unique_items.values()))
+            values = [
+                (job_item.id, job_item.url, job_item.content_hash, job_item.keyword, cluster_ids[job_id])
+                for job_id, job_item in unique_items.items()
+            ]
+            with self.pool.connection() as conn:
+                conn.autocommit = False
+                with conn, conn.cursor() as cur:
+                    rows = psycopg2.extras.execute_values(
+                        cur, insert_query, values, page_size=self.batch_size, fetch=True
+                    )
+                    inserted_ids = [row[0] for row in rows]
+                    cur.execute(keywords_query, (inserted_ids,))
+            self.logger.info(f"Stored {len(inserted_ids)} near-duplicate jobs under their cluster representatives.")
+            return inserted_ids
+
+        except Exception as e:
+            self.logger.error(f"Error storing {len(unique_items)} near-duplicate jobs: {e}")
+            return []
+
+    def get_fresh_job_ids(self, job_ids: list[str], ttl_hours: float | None = None) -> set[str]:
+        """Return the subset of job_ids already stored with a successful extraction newer than ttl_hours."""
+        if not job_ids:
+            return set()
+
+        query = """
+        SELECT id
+        FROM JobAd
+        WHERE id = ANY(%s)
+          AND job_title IS NOT NULL
+          AND (%s::float IS NULL OR updated_at >= NOW() - make_interval(secs => %s::float * 3600));
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(query, (list(job_ids), ttl_hours, ttl_hours))
+                return {row[0] for row in cur.fetchall()}
+        except Exception as e:
+            self.logger.error(f"Failed to look up known job ids: {e}")
+            return set()
+
+    def add_keyword(self, job_ids: list[str], keyword: str) -> None:
+        """Record that already stored jobs were also found under keyword."""
+        if not job_ids:
+            return
+
+        # near-duplicates only count through their representative, tag it as well.
+        query = """
+        UPDATE JobAd
+        SET keywords = array_append(COALESCE(keywords, '{}'), %s)
+        WHERE id IN (SELECT unnest(ARRAY[d.id, COALESCE(d.cluster_id, d.id)]) FROM JobAd d WHERE d.id = ANY(%s))
+          AND NOT (%s = ANY(COALESCE(keywords, '{}')));
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(query, (keyword, list(job_ids), keyword))
+                if cur.rowcount:
+                    self.logger.info(f"Tagged {cur.rowcount} stored jobs with keyword '{keyword}'.")
+        except Exception as e:
+            self.logger.error(f"Failed to add keyword '{keyword}' to jobs: {e}")
+
+    def touch_jobs(self, job_ids: list[str]) -> None:
+        """Mark stored jobs as refreshed without rewriting them, e.g. when the job page is unchanged."""
+        if not job_ids:
+            return
+
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute("UPDATE JobAd SET updated_at = NOW() WHERE id = ANY(%s)", (list(job_ids),))
+        except Exception as e:
+            self.logger.error(f"Failed to touch jobs: {e}")
 
     def query_job(self, query: str):
         """Execute a SELECT query and return all rows."""
         try:
-            with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
                 cur.execute(query)
                 return cur.fetchall()
         except Exception as e:
@@ -126,6 +478,5 @@ class DBHandler:
             return []
 
     def close(self):
-        if self.conn and not self.conn.closed:
-            self.conn.close()
-            self.logger.info("Database connection closed.")
\ No newline at end of file
+        if self._owns_pool:
+            self.pool.close()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import psycopg2
+import psycopg2.pool
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class DBPool:
+    """
+    Thread-safe PostgreSQL connection pool shared by DBHandler and OllamaResearcher.
+
+    Borrowers block when all DB_POOL_MAX_SIZE connections are in use instead of failing.
+    Connections idle for longer than DB_POOL_HEALTHCHECK_SECONDS are pinged before being
+    handed out; dead ones are discarded and replaced by a fresh connection.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.username = os.getenv("username")
+        self.password = os.getenv("password")
+        self.host = os.getenv("host")
+        self.port = os.getenv("port")
+        self.db_name = os.getenv("db_name")
+
+        if not all([self.username, self.password, self.host, self.port, self.db_name]):
+            raise ValueError("Missing database credentials in .env file")
+
+        self.min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+        self.max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+        self.healthcheck_seconds = float(os.getenv("DB_POOL_HEALTHCHECK_SECONDS", "30"))
+        self.max_retries = 3
+
+        self.pool = psycopg2.pool.ThreadedConnectionPool(
+            self.min_size,
+            self.max_size,
+            dbname=self.db_name,
+            user=self.username,
+            password=self.password,
+            host=self.host,
+            port=self.port,
+            # tcp keepalives so a silently dropped socket is noticed during long crawls.
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10,
+            keepalives_count=3,
+        )
+        # ThreadedConnectionPool raises when exhausted, the semaphore makes borrowers wait instead.
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._last_used = {}
+
+        self.logger.info(f"DBPool connected to {self.db_name} (min_size={self.min_size}, max_size={self.max_size})")
+
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0.0) < self.healthcheck_seconds:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+
+    def _acquire(self):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                conn = self.pool.getconn()
+            except psycopg2.OperationalError as e:
+                self.logger.warning(f"Database connect failed (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(min(2 ** attempt, 10))
+                continue
+
+            conn.autocommit = True
+            if self._is_healthy(conn):
+                return conn
+
+            self.logger.warning("Discarding dead database connection, reconnecting.")
+            self._last_used.pop(id(conn), None)
+            self.pool.putconn(conn, close=True)
+
+        raise psycopg2.OperationalError(f"Could not get a healthy connection to {self.db_name}")
+
+
+    @contextmanager
+    def connection(self):
+        """Borrow an autocommit connection for the duration of the with-block."""
+        self._slots.acquire()
+        conn = None
+        broken = False
+        try:
+            conn = self._acquire()
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # the next borrower gets a fresh connection.
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                broken = broken or bool(conn.closed)
+                if broken:
+                    self._last_used.pop(id(conn), None)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                self.pool.putconn(conn, close=broken)
+            self._slots.release()
+
+
+    def close(self):
+        if not self.pool.closed:
+            self.pool.closeall()
+            self.logger.info("Database connection pool closed.")
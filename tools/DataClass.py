@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from crawl4ai import CrawlResult
 
@@ -14,11 +14,23 @@ class ExtractedJobInfo(BaseModel):
     working_location: Optional[str] = Field(default=None, description="working location")
 
 
+class CrawledJob(BaseModel):
+    url: str = Field(description="job ad link")
+    markdown: str = Field(description="crawled job ad content in markdown")
+    html: Optional[str] = Field(default=None, description="raw job ad html, not kept in the durable job queue")
+
+
 class JobInfo(BaseModel):
     id: str = Field(description="job id")
     url: str = Field(description="job ad link")
-    content: str = Field(description="Original job ad content")
+    content: Optional[str] = Field(default=None, description="Original job ad content, dropped once stored in the ContentStore")
+    content_hash: Optional[str] = Field(default=None, description="sha256 of the content in the ContentStore (job_content)")
     keyword: str = Field(description="keyword for searching job ad")
     job_info: Optional[ExtractedJobInfo] | None = Field(description="extracted job information from llm")
-    # embedding: Optional[List[float]] | None = Field(description="embedding vector for the job info")
-    
\ No newline at end of file
+    embedding: Optional[List[float]] = Field(default=None, description="embedding vector for the job info, stored in job_embedding")
+    canonical_terms: Optional[Dict[str, List[str]]] = Field(default=None, description="canonical skills/qualifications/experiences")
+
+
+def job_id_from_url(url: str) -> str:
+    # jobsdb job ad urls end with the numeric job id, e.g. https://hk.jobsdb.com/job/12345678?type=standard
+    return url.split("/")[-1].split("?")[0]
@@ -0,0 +1,198 @@
+from ollama import AsyncClient, Client
+
+import psycopg2.extras
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tools.DataClass import JobInfo, ExtractedJobInfo
+from tools.DBPool import DBPool
+
+
+class EmbeddingGenerator:
+    """
+    Embed extracted job ads with OLLAMA_EMBEDDING_MODEL and store the vectors in pgvector.
+
+    Many jobs are sent per embed call (EMBEDDING_BATCH_SIZE). Vectors live in job_embedding,
+    one row per job with an HNSW cosine index, so find_similar_jobs is an approximate top-k
+    search that stays in the millisecond range over 100k+ ads.
+    Embedding is disabled (with a warning) when the pgvector extension is not available.
+    """
+    def __init__(self, logger, pool: DBPool):
+        self.logger = logger
+        self.pool = pool
+        self.model_name = os.getenv("OLLAMA_EMBEDDING_MODEL", "bge-m3:latest")
+        self.dim = int(os.getenv("EMBEDDING_DIM", "1024"))
+        self.batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        self.ef_search = int(os.getenv("EMBEDDING_EF_SEARCH", "100"))
+        self.client = AsyncClient()
+        self.sync_client = Client()
+
+        self.enabled = self.create_table()
+        self.logger.info(
+            f"{EmbeddingGenerator.__name__} initiated with model {self.model_name} "
+            f"(dim={self.dim}, batch_size={self.batch_size}, enabled={self.enabled})."
+        )
+
+
+    def create_table(self) -> bool:
+        create_table_query = f"""
+        CREATE EXTENSION IF NOT EXISTS vector;
+        CREATE TABLE IF NOT EXISTS job_embedding (
+            id TEXT PRIMARY KEY REFERENCES JobAd (id) ON DELETE CASCADE,
+            model TEXT NOT NULL,
+            embedding vector({self.dim}) NOT NULL,
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_embedding_hnsw
+            ON job_embedding USING hnsw (embedding vector_cosine_ops);
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(create_table_query)
+            self.logger.info("Table job_embedding and HNSW index created (or already exist)")
+            return True
+        except Exception as e:
+            self.logger.warning(f"pgvector not available, job embeddings disabled: {e}")
+            return False
+
+
+    @staticmethod
+    def embedding_text(job_info: ExtractedJobInfo) -> str:
+        # the extracted fields carry the meaning of an ad without the page noise.
+        parts = [job_info.job_title, job_info.company or ""]
+        for field in ("skills", "responsibilities", "qualifications", "experiences"):
+            parts.append("; ".join(getattr(job_info, field)))
+        return "\n".join(part for part in parts if part)
+
+
+    @staticmethod
+    def _to_vector(embedding: list[float]) -> str:
+        # pgvector text format, no python adapter needed.
+        return "[" + ",".join(f"{x:.7g}" for x in embedding) + "]"
+
+
+    async def embed_jobs(self, job_items: list[JobInfo]) -> int:
+        """Embed and store jobs in batches. Returns the number of stored vectors."""
+        items = [job_item for job_item in job_items if job_item.job_info is not None]
+        if not self.enabled or not items:
+            return 0
+
+        stored = 0
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            start = time.perf_counter()
+            try:
+                response = await self.client.embed(
+                    model=self.model_name,
+                    input=[self.embedding_text(job_item.job_info) for job_item in batch],
+                )
+            except Exception as e:
+                self.logger.error(f"Embedding request for {len(batch)} jobs failed: {e}")
+                continue
+
+            rows = [
+                (job_item.id, self.model_name, self._to_vector(embedding))
+                for job_item, embedding in zip(batch, response["embeddings"])
+            ]
+            stored += await asyncio.to_thread(self._store, rows)
+            self.logger.debug(f"Embedded {len(batch)} jobs in {time.perf_counter() - start:.2f}s.")
+
+        self.logger.info(f"Stored {stored} job embeddings.")
+        return stored
+
+
+    def _store(self, rows: list[tuple]) -> int:
+        query = """
+        INSERT INTO job_embedding (id, model, embedding)
+        VALUES %s
+        ON CONFLICT (id) DO UPDATE SET
+            model = EXCLUDED.model,
+            embedding = EXCLUDED.embedding,
+            updated_at = NOW();
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                psycopg2.extras.execute_values(cur, query, rows, template="(%s, %s, %s::vector)")
+            return len(rows)
+        except Exception as e:
+            self.logger.error(f"Failed to store {len(rows)} job embeddings: {e}")
+            return 0
+
+
+    async def embed_missing(self, limit: int = 10000) -> int:
+        """Backfill embeddings for stored jobs that have none, e.g. jobs persisted before this stage existed."""
+        if not self.enabled:
+            return 0
+
+        query = """
+        SELECT j.id, j.url, j.keyword, j.job_title, j.company, j.skills, j.responsibilities, j.qualifications, j.experiences
+        FROM JobAd j
+        LEFT JOIN job_embedding e ON e.id = j.id AND e.model = %s
+        WHERE e.id IS NULL AND j.job_title IS NOT NULL
+        LIMIT %s;
+        """
+        with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, (self.model_name, limit))
+            rows = cur.fetchall()
+
+        job_items = [
+            JobInfo(
+                id=row["id"],
+                url=row["url"],
+                keyword=row["keyword"] or "",
+                job_info=ExtractedJobInfo(
+                    job_title=row["job_title"],
+                    company=row["company"],
+                    skills=row["skills"] or [],
+                    responsibilities=row["responsibilities"] or [],
+                    qualifications=row["qualifications"] or [],
+                    experiences=row["experiences"] or [],
+                ),
+            )
+            for row in rows
+        ]
+        return await self.embed_jobs(job_items)
+
+
+    def find_similar_jobs(self, job_id: str | None = None, text: str | None = None, k: int = 10) -> list[dict]:
+        """
+        Top-k most similar stored jobs to a stored job (job_id) or to free text,
+        as dicts with id, url, job_title, company and cosine similarity.
+        Only vectors of the current model are compared; a job without one has no similar jobs.
+        """
+        if not self.enabled:
+            return []
+        if (job_id is None) == (text is None):
+            raise ValueError("Pass exactly one of job_id or text")
+
+        if text is not None:
+            response = self.sync_client.embed(model=self.model_name, input=[text])
+            target = "%(vector)s::vector"
+            params = {"vector": self._to_vector(response["embeddings"][0]), "job_id": None, "model": self.model_name, "k": k}
+        else:
+            target = "(SELECT embedding FROM job_embedding WHERE id = %(job_id)s AND model = %(model)s)"
+            params = {"vector": None, "job_id": job_id, "model": self.model_name, "k": k}
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM job_embedding WHERE id = %(job_id)s AND model = %(model)s", params)
+                if cur.fetchone() is None:
+                    return []
+
+        query = f"""
+        SELECT j.id, j.url, j.job_title, j.company, 1 - (e.embedding <=> {target}) AS similarity
+        FROM job_embedding e
+        JOIN JobAd j ON j.id = e.id
+        WHERE e.model = %(model)s AND e.id IS DISTINCT FROM %(job_id)s
+        ORDER BY e.embedding <=> {target}
+        LIMIT %(k)s;
+        """
+        with self.pool.connection() as conn:
+            conn.autocommit = False
+            with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                # the hnsw candidate list must be at least k long to return k rows.
+                cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(max(self.ef_search, k)),))
+                cur.execute(query, params)
+                return [dict(row) for row in cur.fetchall()]
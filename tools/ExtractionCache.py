@@ -0,0 +1,130 @@
+from tools.DataClass import ExtractedJobInfo
+from tools.Metrics import metrics
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ExtractionCache:
+    """
+    Persistent SQLite cache of LLM extractions.
+
+    Entries are keyed by (normalized markdown hash, model name, ExtractedJobInfo schema hash),
+    so switching the model or changing the schema simply misses the cache. Least recently
+    used entries are evicted once the cache grows past EXTRACTION_CACHE_MAX_ENTRIES.
+    """
+    def __init__(self, logger, model_name: str):
+        self.logger = logger
+        self.model_name = model_name
+        self.path = os.getenv("EXTRACTION_CACHE_PATH", "./cache/extraction_cache.db")
+        self.max_entries = int(os.getenv("EXTRACTION_CACHE_MAX_ENTRIES", "50000"))
+        self.evict_every = 100
+        self.schema_hash = hashlib.sha256(
+            json.dumps(ExtractedJobInfo.model_json_schema(), sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_table()
+
+        self.logger.info(f"{ExtractionCache.__name__} initiated at {self.path} (max_entries={self.max_entries}).")
+
+
+    def create_table(self) -> None:
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    key TEXT PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    schema_hash TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_accessed ON extraction_cache (last_accessed)"
+            )
+
+
+    @staticmethod
+    def _normalize(markdown: str) -> str:
+        # reposted ads often differ only in whitespace.
+        return re.sub(r"\s+", " ", markdown).strip()
+
+
+    def _make_key(self, markdown: str) -> str:
+        content_hash = hashlib.sha256(self._normalize(markdown).encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{content_hash}:{self.model_name}:{self.schema_hash}".encode("utf-8")).hexdigest()
+
+
+    def get(self, markdown: str) -> ExtractedJobInfo | None:
+        key = self._make_key(markdown)
+        row = self.conn.execute("SELECT payload FROM extraction_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            metrics.incr("extraction_cache_misses_total")
+            return None
+
+        with self.conn:
+            self.conn.execute("UPDATE extraction_cache SET last_accessed = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        metrics.incr("extraction_cache_hits_total")
+
+        return ExtractedJobInfo.model_validate_json(row[0])
+
+
+    def put(self, markdown: str, extracted: ExtractedJobInfo) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO extraction_cache (key, model_name, schema_hash, payload, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET payload = excluded.payload, last_accessed = excluded.last_accessed
+                """,
+                (self._make_key(markdown), self.model_name, self.schema_hash, extracted.model_dump_json(), now, now),
+            )
+
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict()
+
+
+    def evict(self) -> int:
+        """Drop least recently used entries above max_entries. Returns the number of evicted entries."""
+        (total,) = self.conn.execute("SELECT COUNT(*) FROM extraction_cache").fetchone()
+        excess = total - self.max_entries
+        if excess <= 0:
+            return 0
+
+        with self.conn:
+            self.conn.execute(
+                """
+                DELETE FROM extraction_cache WHERE key IN (
+                    SELECT key FROM extraction_cache ORDER BY last_accessed ASC LIMIT ?
+                )
+                """,
+                (excess,),
+            )
+        self.logger.info(f"Extraction cache evicted {excess} least recently used entries.")
+
+        return excess
+
+
+    def close(self) -> None:
+        self.evict()
+        self.conn.close()
+        self.logger.info(f"Extraction cache closed ({self.hits} hits, {self.misses} misses).")
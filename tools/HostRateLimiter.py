@@ -0,0 +1,161 @@
+from crawl4ai import RateLimiter, CrawlResult
+
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class _HostState:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate                # tokens per second
+        self.burst = burst              # bucket size
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0        # set by 429/Retry-After and failure backoff
+        self.failures = 0               # consecutive failures
+        self.lock = asyncio.Lock()      # waiters take tokens in arrival order
+
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.burst)
+        self.updated = now
+
+
+class HostRateLimiter(RateLimiter):
+    """
+    Token-bucket politeness scheduler for crawl4ai dispatchers, one bucket per host.
+
+    Requests start at a steady CRAWLER_REQUESTS_PER_SECOND (bursts up to CRAWLER_BURST),
+    instead of bursting until the site throttles. A 429/503 response blocks the host for its
+    Retry-After, 5xx and network errors for an exponential backoff, and WebCrawler re-queues them.
+    Other failures (404, a gone ad) say nothing about the host's load and don't slow it down.
+    """
+    def __init__(self, logger):
+        super().__init__(rate_limit_codes=[429, 503])
+        self.logger = logger
+        self.rate = float(os.getenv("CRAWLER_REQUESTS_PER_SECOND", "2"))
+        self.burst = int(os.getenv("CRAWLER_BURST", "4"))
+        self.backoff_base = float(os.getenv("CRAWLER_BACKOFF_BASE_SECONDS", "2"))
+        self.backoff_max = float(os.getenv("CRAWLER_BACKOFF_MAX_SECONDS", "120"))
+        self.hosts: dict[str, _HostState] = {}
+
+        self.logger.info(
+            f"{HostRateLimiter.__name__} initiated (rate={self.rate}/s per host, burst={self.burst})."
+        )
+
+
+    def _host(self, url: str) -> _HostState:
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = _HostState(rate=self.rate, burst=self.burst)
+        return self.hosts[host]
+
+
+    async def wait_if_needed(self, url: str) -> None:
+        """Called by the dispatcher before each request: wait for a token of the url's host."""
+        state = self._host(url)
+        state.queued += 1
+        try:
+            async with state.lock:
+                while True:
+                    now = time.monotonic()
+                    if now < state.blocked_until:
+                        await asyncio.sleep(state.blocked_until - now)
+                        continue
+                    state.refill(now)
+                    if state.tokens >= 1:
+                        state.tokens -= 1
+                        break
+                    await asyncio.sleep((1 - state.tokens) / state.rate)
+        finally:
+            state.queued -= 1
+        state.in_flight += 1
+
+
+    def update_delay(self, url: str, status_code: int) -> bool:
+        # the dispatcher only passes the status, the full result (with Retry-After) goes through observe().
+        return True
+
+
+    @staticmethod
+    def _retry_after(result: CrawlResult) -> float | None:
+        headers = {key.lower(): value for key, value in (result.response_headers or {}).items()}
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+    def is_throttled(self, result: CrawlResult) -> bool:
+        return result.status_code in self.rate_limit_codes
+
+
+    def observe(self, result: CrawlResult) -> None:
+        """Record a finished request. Throttled requests, 5xx and network errors push the host back."""
+        state = self._host(result.url)
+        state.in_flight = max(state.in_flight - 1, 0)
+
+        if result.success and not self.is_throttled(result):
+            state.failures = 0
+            state.completed += 1
+            return
+
+        throttled = self.is_throttled(result)
+        if not throttled:
+            state.failed += 1
+            # a 404 or other client error is about the page, not the host.
+            if result.status_code is not None and result.status_code < 500:
+                return
+
+        state.failures += 1
+        delay = None
+        if throttled:
+            state.throttled += 1
+            delay = self._retry_after(result)
+        if delay is None:
+            delay = min(self.backoff_base * 2 ** (state.failures - 1), self.backoff_max) * random.uniform(0.75, 1.25)
+
+        state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        # the bucket is empty after a pause, so requests resume at the steady rate instead of a burst.
+        state.tokens = 0.0
+        self.logger.warning(
+            f"{urlparse(result.url).netloc} returned {result.status_code or result.error_message}, "
+            f"pausing host for {delay:.1f}s ({state.failures} failures in a row)."
+        )
+
+
+    def stats(self) -> dict:
+        return {
+            host: {
+                "queued": state.queued,
+                "in_flight": state.in_flight,
+                "completed": state.completed,
+                "throttled": state.throttled,
+                "failed": state.failed,
+            }
+            for host, state in self.hosts.items()
+        }
+
+
+    def log_stats(self) -> None:
+        for host, stats in self.stats().items():
+            self.logger.info(f"Crawl rate limiter {host}: {stats}")
@@ -0,0 +1,338 @@
+from tools.webCrawler import WebCrawler
+from tools.OllamaSummarizer import OllamaSummarizer
+from tools.DBHandler import DBHandler
+from tools.JobQueue import JobQueue
+from tools.EmbeddingGenerator import EmbeddingGenerator
+from tools.NearDuplicateIndex import NearDuplicateIndex
+from tools.TermCanonicalizer import TermCanonicalizer
+from tools.DataClass import JobInfo, job_id_from_url
+from tools.Metrics import metrics
+
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class JobPipeline:
+    """
+    Streaming pipeline: search pages -> job page crawl -> LLM extraction -> Postgres.
+
+    The stages are connected by bounded asyncio queues, so a job is extracted as soon as
+    its page is crawled and persisted as soon as it is extracted. Wall time approaches the
+    slowest stage instead of the sum of all stages.
+
+    Every job's progress is recorded in the durable JobQueue, so a restarted run first
+    resumes crawled/extracted items and several processes can work on the same keyword.
+    Persisted jobs are embedded in a last stage when an EmbeddingGenerator is given.
+    With a NearDuplicateIndex, only one representative per near-duplicate cluster is extracted;
+    the other members are stored with the representative's extraction at the end of the run.
+    With a TermCanonicalizer, every batch gets canonical skills/qualifications/experiences before the upsert.
+    Stage timings, counts and queue depths are recorded in tools.Metrics.
+    Raw markdown is moved to the ContentStore on persist, so memory is bounded by the queue sizes.
+    """
+    def __init__(
+        self,
+        logger,
+        crawler: WebCrawler,
+        summarizer: OllamaSummarizer,
+        dbhandler: DBHandler,
+        queue: JobQueue,
+        embedder: EmbeddingGenerator | None = None,
+        dedup: NearDuplicateIndex | None = None,
+        canonicalizer: TermCanonicalizer | None = None,
+    ):
+        self.logger = logger
+        self.crawler = crawler
+        self.summarizer = summarizer
+        self.dbhandler = dbhandler
+        self.queue = queue
+        self.embedder = embedder if embedder is not None and embedder.enabled else None
+        self.dedup = dedup
+        self.canonicalizer = canonicalizer
+
+        self.queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+        # per model server, so every endpoint's adaptive limit can be filled.
+        self.extract_workers = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "8")) * len(summarizer.client.endpoints)
+        # incremental mode: skip job ads already stored and extracted within the ttl.
+        self.incremental = os.getenv("INCREMENTAL_MODE", "true").lower() == "true"
+        ttl = os.getenv("JOB_TTL_HOURS")
+        self.job_ttl_hours = float(ttl) if ttl else None
+        self.sample_interval = float(os.getenv("METRICS_SAMPLE_SECONDS", "1"))
+        # (page, job, embed) queues of the runs in progress, summed for the depth gauges.
+        self._active_queues = []
+
+        self.logger.info(
+            f"{JobPipeline.__name__} initiated (queue_size={self.queue_size}, extract_workers={self.extract_workers})."
+        )
+
+
+    async def _filter_known_jobs(self, keyword: str, job_links: list[str]) -> list[str]:
+        # dedupe links by job id, then drop the ids that are already fresh in the database.
+        links_by_id = {}
+        for link in job_links:
+            links_by_id.setdefault(job_id_from_url(link), link)
+
+        if not self.incremental:
+            return list(links_by_id.values())
+
+        known_ids = await asyncio.to_thread(
+            self.dbhandler.get_fresh_job_ids,
+            job_ids=list(links_by_id),
+            ttl_hours=self.job_ttl_hours,
+        )
+        new_links = [link for job_id, link in links_by_id.items() if job_id not in known_ids]
+        metrics.incr("incremental_hits_total", len(known_ids))
+        # the same ad under another keyword: no new work, but it now counts for this keyword too.
+        await asyncio.to_thread(self.dbhandler.add_keyword, job_ids=list(known_ids), keyword=keyword)
+        self.logger.info(
+            f"Incremental mode: {len(known_ids)} hits (already stored), {len(new_links)} misses (new or stale) "
+            f"out of {len(links_by_id)} job links."
+        )
+
+        return new_links
+
+
+    async def _mark_persisted(self, job_ids: list[str], claimed: set[str]) -> None:
+        # persisted items are no longer held by this run.
+        await asyncio.to_thread(self.queue.mark_persisted, job_ids=job_ids)
+        claimed.difference_update(job_ids)
+
+
+    async def _skip_unchanged(self, job_ids: list[str], claimed: set[str]) -> set[str]:
+        # an unchanged page only needs no work if its extraction is already stored.
+        stored = await asyncio.to_thread(self.dbhandler.get_fresh_job_ids, job_ids=job_ids)
+        if stored:
+            await asyncio.to_thread(self.dbhandler.touch_jobs, job_ids=list(stored))
+            await self._mark_persisted(list(stored), claimed)
+            metrics.incr("unchanged_jobs_skipped_total", len(stored))
+        return stored
+
+
+    async def _claim(self, keyword: str, state: str, claimed: set[str], exclude: set[str] | None = None) -> list[dict]:
+        # the claims a run holds are tracked until persisted, for the heartbeat and the final release.
+        rows = await asyncio.to_thread(self.queue.claim, keyword=keyword, state=state, exclude=list(exclude or []))
+        claimed.update(row["id"] for row in rows)
+        return rows
+
+
+    async def _heartbeat(self, claimed: set[str]) -> None:
+        # items wait in the bounded queues for the llm, renew their claims well before the lease runs out.
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            renewed = await asyncio.to_thread(self.queue.renew, job_ids=list(claimed))
+            self.logger.debug(f"Renewed {renewed} job queue claims.")
+
+
+    async def _resume_stage(self, keyword: str, page_queue: asyncio.Queue, job_queue: asyncio.Queue, claimed: set[str]) -> None:
+        # items left by an interrupted run: extracted ones only need persisting, crawled ones extracting.
+        while rows := await self._claim(keyword, "extracted", claimed):
+            self.logger.info(f"Resuming {len(rows)} extracted jobs for keyword '{keyword}'.")
+            for row in rows:
+                await job_queue.put(JobQueue.to_job_info(row))
+
+        while rows := await self._claim(keyword, "crawled", claimed):
+            self.logger.info(f"Resuming {len(rows)} crawled jobs for keyword '{keyword}'.")
+            for row in rows:
+                await page_queue.put(JobQueue.to_crawled_job(row))
+
+
+    async def _crawl_stage(
+        self,
+        keyword: str,
+        total_pages: int,
+        page_queue: asyncio.Queue,
+        job_queue: asyncio.Queue,
+        duplicates: dict[str, tuple[JobInfo, str]],
+        claimed: set[str],
+    ) -> None:
+        await self._resume_stage(keyword, page_queue, job_queue, claimed)
+
+        job_links = await self.crawler.crawl_job_links(keyword=keyword, total_pages=total_pages)
+        job_links = await self._filter_known_jobs(keyword, job_links)
+        await asyncio.to_thread(self.queue.enqueue, keyword=keyword, urls=job_links)
+        # items whose attempts the rediscovery just reset.
+        await self._resume_stage(keyword, page_queue, job_queue, claimed)
+
+        # claim discovered items in batches, other workers on the same keyword take the rest.
+        # pages that failed to crawl are released but not claimed again in this run.
+        released = set()
+        while rows := await self._claim(keyword, "discovered", claimed, exclude=released):
+            ids_by_url = {row["url"]: row["id"] for row in rows}
+
+            # pages the server reports as not modified are not crawled at all.
+            not_modified = await self.crawler.check_not_modified(urls=list(ids_by_url))
+            skipped = await self._skip_unchanged([ids_by_url[url] for url in not_modified], claimed)
+            urls = [url for url, job_id in ids_by_url.items() if job_id not in skipped]
+
+            async for result in self.crawler.stream_job_pages(urls=urls):
+                job_id = ids_by_url.get(result.url) or job_id_from_url(result.url)
+                if not result.success:
+                    self.logger.warning(f"Failed to crawl job page {result.url}: {result.error_message}")
+                    await asyncio.to_thread(self.queue.release, job_ids=[job_id])
+                    released.add(job_id)
+                    claimed.discard(job_id)
+                    continue
+                # same target markdown as last time: skip extraction and upsert.
+                if self.crawler.is_unchanged(result) and await self._skip_unchanged([job_id], claimed):
+                    skipped.add(job_id)
+                    continue
+                # near-duplicate of an indexed ad: reuse the representative's extraction.
+                if self.dedup is not None:
+                    markdown = str(result.markdown or "")
+                    cluster_id = await asyncio.to_thread(self.dedup.assign, job_id=job_id, markdown=markdown)
+                    if cluster_id != job_id:
+                        metrics.incr("near_duplicates_total")
+                        # only the content hash is held until the end of the run.
+                        content_hash = await asyncio.to_thread(self.dbhandler.content_store.put, markdown)
+                        duplicates[job_id] = (
+                            JobInfo(id=job_id, url=result.url, content_hash=content_hash, keyword=keyword, job_info=None),
+                            cluster_id,
+                        )
+                        continue
+                await asyncio.to_thread(self.queue.mark_crawled, job_id=job_id, markdown=result.markdown)
+                await page_queue.put(result)
+            if skipped:
+                self.logger.info(f"{len(skipped)} unchanged job ads skipped extraction and upsert.")
+
+        # one sentinel per extraction worker, only on normal completion: after a failure the
+        # TaskGroup cancels the workers, and a put on the full queue would block forever.
+        for _ in range(self.extract_workers):
+            await page_queue.put(None)
+
+
+    async def _extract_stage(self, keyword: str, page_queue: asyncio.Queue, job_queue: asyncio.Queue, failed: list) -> None:
+        while True:
+            result = await page_queue.get()
+            if result is None:
+                return
+            job_info = await self.summarizer.summarize_job(result=result, keyword=keyword, failed=failed)
+            # failed extractions are retried at the end instead of being persisted empty.
+            if job_info is not None:
+                await asyncio.to_thread(self.queue.mark_extracted, job_info=job_info)
+                await job_queue.put(job_info)
+
+
+    async def _persist_stage(self, job_queue: asyncio.Queue, embed_queue: asyncio.Queue, claimed: set[str]) -> int:
+        persisted = 0
+        done = False
+        while not done:
+            # wait for one job, then drain whatever else is already queued into the same batch.
+            batch = [await job_queue.get()]
+            while len(batch) < self.dbhandler.batch_size and not job_queue.empty():
+                batch.append(job_queue.get_nowait())
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            if batch:
+                start = time.perf_counter()
+                # psycopg2 is blocking, keep it off the event loop.
+                if self.canonicalizer is not None:
+                    await asyncio.to_thread(self.canonicalizer.canonicalize_jobs, job_items=batch)
+                inserted_ids = await asyncio.to_thread(self.dbhandler.insert_jobs, job_items=batch)
+                await self._mark_persisted(inserted_ids, claimed)
+                persisted += len(inserted_ids)
+                metrics.observe("persist_batch", time.perf_counter() - start)
+                metrics.incr("persisted_jobs_total", len(inserted_ids))
+                if self.embedder is not None:
+                    inserted = set(inserted_ids)
+                    for job_info in batch:
+                        if job_info.id in inserted:
+                            await embed_queue.put(job_info)
+
+        await embed_queue.put(None)
+        return persisted
+
+
+    async def _embed_stage(self, embed_queue: asyncio.Queue) -> int:
+        if self.embedder is None:
+            while await embed_queue.get() is not None:
+                pass
+            return 0
+
+        embedded = 0
+        done = False
+        while not done:
+            batch = [await embed_queue.get()]
+            while len(batch) < self.embedder.batch_size and not embed_queue.empty():
+                batch.append(embed_queue.get_nowait())
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            if batch:
+                with metrics.timer("embed_batch"):
+                    embedded += await self.embedder.embed_jobs(batch)
+                metrics.incr("embedded_jobs_total", len(batch))
+
+        return embedded
+
+
+    async def _sample_queues(self) -> None:
+        # depths are sampled, set_gauge keeps the maximum for the run summary.
+        while True:
+            for name, i in (("page_queue_depth", 0), ("job_queue_depth", 1), ("embed_queue_depth", 2)):
+                metrics.set_gauge(name, sum(queues[i].qsize() for queues in self._active_queues))
+            await asyncio.sleep(self.sample_interval)
+
+
+    async def run(self, keyword: str, total_pages: int) -> int:
+        """Run the streaming pipeline for one keyword. Returns the number of persisted jobs."""
+        start = time.perf_counter()
+        page_queue = asyncio.Queue(maxsize=self.queue_size)
+        job_queue = asyncio.Queue(maxsize=self.queue_size)
+        embed_queue = asyncio.Queue(maxsize=self.queue_size)
+        duplicates = {}
+        failed = []
+        claimed = set()
+        queues = (page_queue, job_queue, embed_queue)
+        self._active_queues.append(queues)
+        sampler = asyncio.create_task(self._sample_queues())
+        heartbeat = asyncio.create_task(self._heartbeat(claimed))
+
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._embed_stage(embed_queue))
+                persister = tg.create_task(self._persist_stage(job_queue, embed_queue, claimed))
+                extractors = [
+                    tg.create_task(self._extract_stage(keyword, page_queue, job_queue, failed))
+                    for _ in range(self.extract_workers)
+                ]
+                with metrics.timer("crawl_stage"):
+                    await self._crawl_stage(keyword, total_pages, page_queue, job_queue, duplicates, claimed)
+                await asyncio.gather(*extractors)
+                for job_info in await self.summarizer.retry_failed(failed):
+                    await asyncio.to_thread(self.queue.mark_extracted, job_info=job_info)
+                    await job_queue.put(job_info)
+                await job_queue.put(None)
+
+            # representatives are stored now, duplicates copy their extraction.
+            if duplicates:
+                stored_ids = await asyncio.to_thread(
+                    self.dbhandler.insert_duplicates,
+                    job_items=[job_info for job_info, _ in duplicates.values()],
+                    cluster_ids={job_id: cluster_id for job_id, (_, cluster_id) in duplicates.items()},
+                )
+                await self._mark_persisted(stored_ids, claimed)
+                self.logger.info(
+                    f"{len(duplicates)} near-duplicate job ads not extracted, {len(stored_ids)} stored with their representative."
+                )
+        finally:
+            sampler.cancel()
+            heartbeat.cancel()
+            self._active_queues.remove(queues)
+            # unfinished items (failed crawls/extractions) become claimable again for the next run.
+            # only this run's claims: other keyword runs of the process share the worker id and items.
+            await asyncio.to_thread(self.queue.release, job_ids=list(claimed))
+
+        persisted = persister.result()
+        elapsed = time.perf_counter() - start
+        metrics.observe("pipeline_run", elapsed)
+        counts = await asyncio.to_thread(self.queue.counts, keyword=keyword)
+        self.logger.info(
+            f"Pipeline finished for keyword '{keyword}': {persisted} jobs persisted in {elapsed:.1f}s "
+            f"({persisted / max(elapsed, 1e-9):.2f} jobs/s). Job queue states: {counts}"
+        )
+
+        return persisted
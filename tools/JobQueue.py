@@ -0,0 +1,254 @@
+import psycopg2.extras
+from psycopg2 import sql
+import os
+import socket
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tools.DataClass import ExtractedJobInfo, CrawledJob, JobInfo, job_id_from_url
+from tools.DBPool import DBPool
+
+
+class JobQueue:
+    """
+    Durable work queue in Postgres tracking every job ad through the pipeline:
+    discovered -> crawled (markdown stored) -> extracted (llm output stored) -> persisted.
+
+    Workers claim items with SELECT ... FOR UPDATE SKIP LOCKED, so several processes (or nodes)
+    can share one keyword without double work, and a restarted run resumes where it stopped.
+    Claims older than JOB_QUEUE_LEASE_SECONDS are treated as abandoned and can be reclaimed, so a
+    worker renews the claims it still holds (every state change does too, see renew()).
+    A job found under several keywords is one item carrying all of them in keywords.
+    """
+    STATES = ("discovered", "crawled", "extracted", "persisted")
+
+    def __init__(self, logger, pool: DBPool):
+        self.logger = logger
+        self.pool = pool
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = int(os.getenv("JOB_QUEUE_LEASE_SECONDS", "900"))
+        self.claim_batch = int(os.getenv("JOB_QUEUE_CLAIM_BATCH", "200"))
+        self.max_attempts = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+
+        self.create_table()
+        self._release_dead_local_claims()
+        self.logger.info(f"{JobQueue.__name__} initiated (worker_id={self.worker_id}, lease={self.lease_seconds}s).")
+
+
+    def create_table(self) -> None:
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS job_queue (
+            id TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            keyword TEXT NOT NULL,
+            keywords TEXT[] NOT NULL DEFAULT '{}',
+            state TEXT NOT NULL DEFAULT 'discovered',
+            markdown TEXT,
+            extracted JSONB,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            claimed_by TEXT,
+            claimed_at TIMESTAMPTZ,
+            created_at TIMESTAMPTZ DEFAULT NOW(),
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_queue_state ON job_queue (keyword, state, updated_at);
+        ALTER TABLE job_queue ADD COLUMN IF NOT EXISTS keywords TEXT[] NOT NULL DEFAULT '{}';
+        UPDATE job_queue SET keywords = ARRAY[keyword] WHERE keywords = '{}';
+        CREATE INDEX IF NOT EXISTS idx_job_queue_keywords ON job_queue USING GIN (keywords);
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(create_table_query)
+            self.logger.info("Table job_queue created (or already exists)")
+        except Exception as e:
+            self.logger.error(f"Failed to create job_queue: {e}")
+            raise
+
+
+    def _release_dead_local_claims(self) -> None:
+        # a crashed run on this host would otherwise block its items until the lease expires.
+        hostname = socket.gethostname()
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "SELECT DISTINCT claimed_by FROM job_queue WHERE claimed_by LIKE %s AND state != 'persisted'",
+                (f"{hostname}:%",),
+            )
+            dead = []
+            for (claimed_by,) in cur.fetchall():
+                pid = int(claimed_by.rsplit(":", 1)[1])
+                try:
+                    os.kill(pid, 0)
+                except ProcessLookupError:
+                    dead.append(claimed_by)
+                except PermissionError:
+                    pass
+            if dead:
+                cur.execute(
+                    "UPDATE job_queue SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = ANY(%s)",
+                    (dead,),
+                )
+                self.logger.info(f"Released {cur.rowcount} job queue claims left by dead workers {dead}.")
+
+
+    def enqueue(self, keyword: str, urls: list[str]) -> int:
+        """
+        Record discovered job links. Finished items are re-queued, in-progress ones keep their state.
+        Rediscovering an item no worker holds resets its attempts, so it is retried again in this run.
+        """
+        rows = list({job_id_from_url(url): (job_id_from_url(url), url, keyword, [keyword]) for url in urls}.values())
+        if not rows:
+            return 0
+
+        # an item another keyword is working on only gains this keyword, it is processed once.
+        query = """
+        INSERT INTO job_queue (id, url, keyword, keywords)
+        VALUES %s
+        ON CONFLICT (id) DO UPDATE SET
+            url = EXCLUDED.url,
+            keyword = CASE WHEN job_queue.state = 'persisted' THEN EXCLUDED.keyword ELSE job_queue.keyword END,
+            keywords = CASE
+                WHEN job_queue.state = 'persisted' THEN EXCLUDED.keywords
+                WHEN EXCLUDED.keyword = ANY(job_queue.keywords) THEN job_queue.keywords
+                ELSE job_queue.keywords || EXCLUDED.keywords
+            END,
+            state = CASE WHEN job_queue.state = 'persisted' THEN 'discovered' ELSE job_queue.state END,
+            attempts = CASE WHEN job_queue.state = 'persisted' OR job_queue.claimed_by IS NULL THEN 0 ELSE job_queue.attempts END,
+            updated_at = NOW();
+        """
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, query, rows, template="(%s, %s, %s, %s::text[])")
+        self.logger.info(f"Enqueued {len(rows)} job links for keyword '{keyword}'.")
+
+        return len(rows)
+
+
+    def claim(self, keyword: str, state: str, limit: int | None = None, exclude: list[str] | None = None) -> list[dict]:
+        """Claim up to limit unclaimed (or abandoned) items in the given state for this worker, except the exclude ids."""
+        query = """
+        UPDATE job_queue q
+        SET claimed_by = %(worker_id)s, claimed_at = NOW(), attempts = q.attempts + 1
+        WHERE q.id IN (
+            SELECT id FROM job_queue
+            WHERE %(keyword)s = ANY(keywords)
+              AND state = %(state)s
+              AND attempts < %(max_attempts)s
+              AND NOT (id = ANY(%(exclude)s::text[]))
+              AND (claimed_at IS NULL OR claimed_at < NOW() - make_interval(secs => %(lease)s))
+            ORDER BY updated_at
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING q.id, q.url, q.keyword, q.markdown, q.extracted;
+        """
+        params = {
+            "worker_id": self.worker_id,
+            "keyword": keyword,
+            "state": state,
+            "lease": self.lease_seconds,
+            "max_attempts": self.max_attempts,
+            "limit": limit or self.claim_batch,
+            "exclude": list(exclude or []),
+        }
+        with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+
+
+    def _advance(self, state: str, rows: list[tuple], set_clause: str = "") -> None:
+        # rows are (id, *values for set_clause). The claim is kept until the item is persisted,
+        # so no other worker picks up an item this worker is still extracting.
+        if not rows:
+            return
+        columns = ", ".join(["id"] + [f"v{i}" for i in range(len(rows[0]) - 1)])
+        query = sql.SQL(f"""
+        UPDATE job_queue q
+        SET state = {{state}}, updated_at = NOW() {set_clause}
+        FROM (VALUES %s) AS v({columns})
+        WHERE q.id = v.id;
+        """).format(state=sql.Literal(state))
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            psycopg2.extras.execute_values(cur, query, rows)
+
+
+    def mark_crawled(self, job_id: str, markdown: str) -> None:
+        self._advance("crawled", [(job_id, str(markdown))], ", markdown = v.v0, claimed_at = NOW()")
+
+
+    def mark_extracted(self, job_info: JobInfo) -> None:
+        self._advance("extracted", [(job_info.id, job_info.job_info.model_dump_json())], ", extracted = v.v0::jsonb, claimed_at = NOW()")
+
+
+    def mark_persisted(self, job_ids: list[str]) -> None:
+        # markdown and extraction now live in JobAd, drop the copies.
+        self._advance(
+            "persisted",
+            [(job_id,) for job_id in job_ids],
+            ", markdown = NULL, extracted = NULL, claimed_by = NULL, claimed_at = NULL",
+        )
+        # keywords that found the job while it was in progress elsewhere. a near-duplicate only
+        # counts through its representative, so the representative gets them too.
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE JobAd j
+                SET keywords = ARRAY(SELECT DISTINCT unnest(COALESCE(j.keywords, '{}') || m.keywords) ORDER BY 1)
+                FROM (
+                    SELECT t.target, array_agg(DISTINCT k.keyword) AS keywords
+                    FROM job_queue q
+                    JOIN JobAd d ON d.id = q.id
+                    CROSS JOIN LATERAL (VALUES (d.id), (COALESCE(d.cluster_id, d.id))) AS t(target)
+                    CROSS JOIN LATERAL unnest(q.keywords) AS k(keyword)
+                    WHERE q.id = ANY(%s)
+                    GROUP BY t.target
+                ) m
+                WHERE j.id = m.target AND NOT (m.keywords <@ COALESCE(j.keywords, '{}'))
+                """,
+                (list(job_ids),),
+            )
+
+
+    def renew(self, job_ids: list[str]) -> int:
+        """Extend the lease of the unfinished items this worker holds, e.g. ones still waiting in a pipeline queue."""
+        if not job_ids:
+            return 0
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "UPDATE job_queue SET claimed_at = NOW() WHERE id = ANY(%s) AND claimed_by = %s AND state != 'persisted'",
+                (list(job_ids), self.worker_id),
+            )
+            return cur.rowcount
+
+
+    def release(self, job_ids: list[str]) -> None:
+        """Give up a claim without changing state, so the item is retried later or by another worker."""
+        if not job_ids:
+            return
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                "UPDATE job_queue SET claimed_by = NULL, claimed_at = NULL WHERE id = ANY(%s) AND claimed_by = %s",
+                (list(job_ids), self.worker_id),
+            )
+
+
+    def counts(self, keyword: str) -> dict:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT state, COUNT(*) FROM job_queue WHERE %s = ANY(keywords) GROUP BY state", (keyword,))
+            counts = dict(cur.fetchall())
+        return {state: counts.get(state, 0) for state in self.STATES}
+
+
+    @staticmethod
+    def to_crawled_job(row: dict) -> CrawledJob:
+        return CrawledJob(url=row["url"], markdown=row["markdown"] or "")
+
+
+    @staticmethod
+    def to_job_info(row: dict) -> JobInfo:
+        return JobInfo(
+            id=row["id"],
+            url=row["url"],
+            content=row["markdown"],
+            keyword=row["keyword"],
+            job_info=ExtractedJobInfo.model_validate(row["extracted"]),
+        )
@@ -0,0 +1,110 @@
+import os
+import re
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# page furniture that jobsdb renders around every job ad.
+BOILERPLATE_PATTERNS = [
+    r"^skip to (main )?content$",
+    r"^(quick )?apply( now)?$",
+    r"^save( job)?$",
+    r"^report this job( ad)?$",
+    r"^be careful\b.*",
+    r"^don.t provide your bank or credit card details.*",
+    r"^learn how to protect yourself.*",
+    r"^posted \d+[dhm] ago$",
+    r"^(view|see) all jobs$",
+    r"^more jobs from this (company|employer)$",
+    r"^share( this job)?$",
+]
+
+
+class MarkdownTrimmer:
+    """
+    Shrink crawled job markdown before it is sent to the extraction model.
+
+    Links, images, URLs and page boilerplate are stripped, whitespace is collapsed, repeated
+    paragraphs are dropped and the result is capped at LLM_MAX_INPUT_TOKENS.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.max_tokens = int(os.getenv("LLM_MAX_INPUT_TOKENS", "4000"))
+        self.max_ctx = int(os.getenv("LLM_MAX_NUM_CTX", "16384"))
+        self.chars_per_token = 4        # rough estimate for english text, good enough for sizing num_ctx
+        self.boilerplate = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+        self.jobs = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+        self.logger.info(f"{MarkdownTrimmer.__name__} initiated (max_tokens={self.max_tokens}).")
+
+
+    def estimate_tokens(self, text: str) -> int:
+        return len(text) // self.chars_per_token + 1
+
+
+    def num_ctx_for(self, prompt: str, num_predict: int) -> int:
+        # context must hold the prompt and the answer, rounded up so ollama can reuse loaded runners.
+        needed = self.estimate_tokens(prompt) + num_predict
+        return min(max(-(-needed // 1024) * 1024, 2048), self.max_ctx)
+
+
+    def trim(self, markdown: str) -> str:
+        text = markdown or ""
+        text = re.sub(r"!\[[^\]]*\]\([^)]*\)", "", text)               # images
+        text = re.sub(r"\[([^\]]*)\]\([^)]*\)", r"\1", text)           # links -> link text
+        text = re.sub(r"<?https?://\S+>?", "", text)                    # bare urls
+
+        paragraphs = []
+        seen = set()
+        for block in re.split(r"\n\s*\n", text):
+            lines = []
+            for line in block.splitlines():
+                line = re.sub(r"\s+", " ", line).strip()
+                # lines that were only links or markup are empty now.
+                if not line.strip("*_#>-|• ") or self.boilerplate.match(line.strip("*_#>-|• ")):
+                    continue
+                lines.append(line)
+            if not lines:
+                continue
+            paragraph = "\n".join(lines)
+            key = re.sub(r"\W+", "", paragraph).casefold()
+            if key in seen:
+                continue
+            seen.add(key)
+            paragraphs.append(paragraph)
+
+        # cap the size at a paragraph boundary where possible.
+        max_chars = self.max_tokens * self.chars_per_token
+        trimmed = []
+        length = 0
+        for paragraph in paragraphs:
+            if length + len(paragraph) > max_chars:
+                if not trimmed:
+                    trimmed.append(paragraph[:max_chars])
+                break
+            trimmed.append(paragraph)
+            length += len(paragraph) + 2
+
+        result = "\n\n".join(trimmed)
+
+        before, after = self.estimate_tokens(markdown or ""), self.estimate_tokens(result)
+        self.jobs += 1
+        self.tokens_before += before
+        self.tokens_after += after
+        self.logger.debug(f"Trimmed job markdown from ~{before} to ~{after} tokens.")
+
+        return result
+
+
+    def log_stats(self) -> None:
+        if not self.jobs:
+            return
+        saved = 1 - self.tokens_after / max(self.tokens_before, 1)
+        self.logger.info(
+            f"Markdown trimming: {self.jobs} jobs, ~{self.tokens_before} -> ~{self.tokens_after} prompt tokens "
+            f"({saved:.0%} saved, avg ~{self.tokens_after // self.jobs} tokens/job)."
+        )
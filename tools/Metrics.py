@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Metrics:
+    """
+    Process-wide pipeline metrics: counters, gauges and timing summaries.
+
+    Components record into the shared `metrics` instance of this module (thread safe, the DB
+    stages run in worker threads). At the end of a run the values are written as a JSON summary
+    to METRICS_PATH, and with METRICS_PORT set they are served in Prometheus text format.
+    """
+    def __init__(self, prefix: str = "jobresearch", max_samples: int = 4096):
+        self.prefix = prefix
+        self.max_samples = max_samples
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}          # name -> [count, total seconds, recent samples]
+        self._server = None
+
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+            self._gauges[f"{name}_max"] = max(self._gauges.get(f"{name}_max", value), value)
+
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            timing = self._timings.setdefault(name, [0, 0.0, deque(maxlen=self.max_samples)])
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2].append(seconds)
+
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+
+    @staticmethod
+    def _quantile(samples: list[float], q: float) -> float:
+        if not samples:
+            return 0.0
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+    def summary(self) -> dict:
+        """Snapshot of every metric plus derived rates over the process lifetime."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: (count, total, sorted(samples)) for name, (count, total, samples) in self._timings.items()}
+
+        elapsed = max(time.time() - self.started, 1e-9)
+        rates = {f"{name[:-len('_total')]}_per_sec": value / elapsed for name, value in counters.items() if name.endswith("_total")}
+        # llm token rates from the server side durations, not wall time.
+        for kind in ("prompt_eval", "eval"):
+            tokens = counters.get(f"llm_{kind}_tokens_total", 0)
+            seconds = counters.get(f"llm_{kind}_seconds_total", 0)
+            if seconds:
+                rates[f"llm_{kind}_tokens_per_sec"] = tokens / seconds
+        hit_rates = {}
+        for cache in ("extraction_cache", "page_cache"):
+            hits = counters.get(f"{cache}_hits_total", 0)
+            lookups = hits + counters.get(f"{cache}_misses_total", 0)
+            if lookups:
+                hit_rates[f"{cache}_hit_rate"] = hits / lookups
+
+        return {
+            "started_at": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "elapsed_seconds": round(elapsed, 3),
+            "counters": counters,
+            "gauges": gauges,
+            "rates": rates,
+            "hit_rates": hit_rates,
+            "timings": {
+                name: {
+                    "count": count,
+                    "total_seconds": round(total, 6),
+                    "mean_seconds": round(total / count, 6) if count else 0.0,
+                    "p50_seconds": round(self._quantile(samples, 0.5), 6),
+                    "p95_seconds": round(self._quantile(samples, 0.95), 6),
+                    "max_seconds": round(samples[-1], 6) if samples else 0.0,
+                }
+                for name, (count, total, samples) in timings.items()
+            },
+        }
+
+
+    def write_summary(self, path: str | None = None) -> str:
+        """Write the JSON run summary and return its path."""
+        folder = path or os.getenv("METRICS_PATH", "./metrics/")
+        os.makedirs(folder, exist_ok=True)
+        filepath = os.path.join(folder, f"run_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        return filepath
+
+
+    def prometheus_text(self) -> str:
+        summary = self.summary()
+        lines = []
+        for name, value in summary["counters"].items():
+            lines += [f"# TYPE {self.prefix}_{name} counter", f"{self.prefix}_{name} {value}"]
+        for name, value in summary["gauges"].items():
+            lines += [f"# TYPE {self.prefix}_{name} gauge", f"{self.prefix}_{name} {value}"]
+        for name, timing in summary["timings"].items():
+            metric = f"{self.prefix}_{name}_seconds"
+            lines += [
+                f"# TYPE {metric} summary",
+                f'{metric}{{quantile="0.5"}} {timing["p50_seconds"]}',
+                f'{metric}{{quantile="0.95"}} {timing["p95_seconds"]}',
+                f"{metric}_sum {timing['total_seconds']}",
+                f"{metric}_count {timing['count']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # any GET gets the metrics, the request itself is not needed.
+            await reader.readuntil(b"\r\n\r\n")
+            body = self.prometheus_text().encode("utf-8")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def start_server(self, port: int, host: str = "0.0.0.0") -> None:
+        """Serve the Prometheus text format on http://host:port/metrics."""
+        self._server = await asyncio.start_server(self._handle, host=host, port=port)
+
+
+    async def stop_server(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+# shared by every component of the process.
+metrics = Metrics()
@@ -0,0 +1,154 @@
+import numpy as np
+import psycopg2.extras
+
+import hashlib
+import os
+import re
+import zlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tools.DBPool import DBPool
+
+
+# mersenne prime above the 32-bit shingle hashes, a*x+b stays inside uint64 for a < 2^31.
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index over shingled job markdown, stored in Postgres so every worker shares it.
+
+    Each job page gets a MinHash signature of its word shingles. The signature is cut into
+    NEAR_DUP_BANDS bands; jobs sharing a band bucket are candidates, and a candidate whose
+    estimated Jaccard similarity is at least NEAR_DUP_THRESHOLD puts the job into its cluster.
+    Lookups only touch the matching buckets, so the cost does not grow with the number of ads.
+    The first job of a cluster is its representative, the only one sent to the LLM.
+    """
+    def __init__(self, logger, pool: DBPool):
+        self.logger = logger
+        self.pool = pool
+        self.num_perm = int(os.getenv("NEAR_DUP_NUM_PERM", "128"))
+        self.bands = int(os.getenv("NEAR_DUP_BANDS", "16"))
+        self.threshold = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+        self.shingle_size = int(os.getenv("NEAR_DUP_SHINGLE_SIZE", "5"))
+        if self.num_perm % self.bands:
+            raise ValueError("NEAR_DUP_NUM_PERM must be a multiple of NEAR_DUP_BANDS")
+        self.rows = self.num_perm // self.bands
+
+        # fixed seed: signatures must stay comparable across runs and processes.
+        rng = np.random.default_rng(20240601)
+        self._a = rng.integers(1, 1 << 31, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=self.num_perm, dtype=np.uint64)
+
+        self.duplicates = 0
+        self.create_table()
+
+        self.logger.info(
+            f"{NearDuplicateIndex.__name__} initiated (num_perm={self.num_perm}, bands={self.bands}, "
+            f"threshold={self.threshold})."
+        )
+
+
+    def create_table(self) -> None:
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS job_minhash (
+            id TEXT PRIMARY KEY,
+            cluster_id TEXT NOT NULL,
+            signature BYTEA NOT NULL,
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        CREATE TABLE IF NOT EXISTS job_lsh_bucket (
+            band SMALLINT NOT NULL,
+            bucket BIGINT NOT NULL,
+            id TEXT NOT NULL REFERENCES job_minhash (id) ON DELETE CASCADE,
+            PRIMARY KEY (band, bucket, id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_job_lsh_bucket_id ON job_lsh_bucket (id);
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(create_table_query)
+            self.logger.info("Tables job_minhash and job_lsh_bucket created (or already exist)")
+        except Exception as e:
+            self.logger.error(f"Failed to create near-duplicate index tables: {e}")
+            raise
+
+
+    def _shingles(self, markdown: str) -> set[bytes]:
+        # word shingles of the normalized text, so formatting and case differences don't matter.
+        words = re.findall(r"\w+", markdown.casefold())
+        if len(words) <= self.shingle_size:
+            return {" ".join(words).encode("utf-8")} if words else set()
+        return {
+            " ".join(words[i:i + self.shingle_size]).encode("utf-8")
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+
+    def signature(self, markdown: str) -> np.ndarray | None:
+        shingles = self._shingles(markdown)
+        if not shingles:
+            return None
+        hashes = np.fromiter((zlib.crc32(shingle) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+        # (num_perm, n_shingles) permuted hashes, min over shingles.
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+
+    def _buckets(self, signature: np.ndarray) -> list[tuple[int, int]]:
+        buckets = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(), digest_size=8).digest()
+            buckets.append((band, int.from_bytes(digest, "big", signed=True)))
+        return buckets
+
+
+    def assign(self, job_id: str, markdown: str) -> str:
+        """Index a crawled job page and return its cluster id (the job id itself for a representative)."""
+        signature = self.signature(markdown)
+        if signature is None:
+            return job_id
+        buckets = self._buckets(signature)
+
+        candidates_query = """
+        SELECT m.id, m.cluster_id, m.signature
+        FROM job_minhash m
+        WHERE m.id IN (
+            SELECT b.id FROM job_lsh_bucket b
+            JOIN unnest(%s::smallint[], %s::bigint[]) AS v(band, bucket) ON b.band = v.band AND b.bucket = v.bucket
+        ) AND m.id != %s;
+        """
+        with self.pool.connection() as conn:
+            conn.autocommit = False
+            with conn, conn.cursor() as cur:
+                cur.execute(candidates_query, ([band for band, _ in buckets], [bucket for _, bucket in buckets], job_id))
+                best_similarity, cluster_id = 0.0, job_id
+                for candidate_id, candidate_cluster, candidate_signature in cur.fetchall():
+                    candidate = np.frombuffer(bytes(candidate_signature), dtype=np.uint64)
+                    similarity = float(np.mean(candidate == signature))
+                    if similarity >= self.threshold and similarity > best_similarity:
+                        best_similarity, cluster_id = similarity, candidate_cluster
+
+                cur.execute(
+                    """
+                    INSERT INTO job_minhash (id, cluster_id, signature) VALUES (%s, %s, %s)
+                    ON CONFLICT (id) DO UPDATE SET
+                        cluster_id = EXCLUDED.cluster_id,
+                        signature = EXCLUDED.signature,
+                        updated_at = NOW();
+                    DELETE FROM job_lsh_bucket WHERE id = %s;
+                    """,
+                    (job_id, cluster_id, psycopg2.Binary(signature.tobytes()), job_id),
+                )
+                psycopg2.extras.execute_values(
+                    cur,
+                    "INSERT INTO job_lsh_bucket (band, bucket, id) VALUES %s ON CONFLICT DO NOTHING",
+                    [(band, bucket, job_id) for band, bucket in buckets],
+                )
+
+        if cluster_id != job_id:
+            self.duplicates += 1
+            self.logger.debug(f"Job {job_id} is a near-duplicate of {cluster_id} (similarity {best_similarity:.2f}).")
+        return cluster_id
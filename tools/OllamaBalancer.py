@@ -0,0 +1,155 @@
+from ollama import AsyncClient
+
+from tools.AdaptiveLimiter import AdaptiveLimiter
+
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class _Endpoint:
+    def __init__(self, logger, host: str | None, max_inflight: int, timeout: float):
+        self.host = host
+        self.name = host or "default"
+        self.client = AsyncClient(host=host, timeout=timeout)
+        # each server gets its own adaptive concurrency, capped at max_inflight.
+        self.limiter = AdaptiveLimiter(logger=logger, name=f"ollama {self.name}", max_limit=max_inflight)
+        self.completed = 0
+        self.failures = 0           # consecutive failures
+        self.down_until = 0.0
+
+    @property
+    def in_flight(self) -> int:
+        return self.limiter.in_flight
+
+    def available(self, now: float) -> bool:
+        return self.down_until <= now and self.limiter.available()
+
+
+class OllamaBalancer:
+    """
+    Dispatch Ollama chat requests across several model servers.
+
+    Each request goes to the healthy endpoint with the fewest outstanding requests. Every endpoint
+    has its own AdaptiveLimiter (at most min(OLLAMA_MAX_CONCURRENCY, OLLAMA_ENDPOINT_MAX_INFLIGHT)
+    requests), so capacity grows with the number of servers and a failover counts as a failure
+    of the endpoint that failed. A failing endpoint is taken out of rotation for
+    a growing cooldown and the request fails over to the next one. A single endpoint is never
+    taken out, the caller's retry backoff already spaces out requests to it.
+    Endpoints come from OLLAMA_HOSTS (comma separated), defaulting to the local ollama host.
+    """
+    def __init__(self, logger, hosts: list[str] | None = None):
+        self.logger = logger
+        if hosts is None:
+            hosts = [host.strip() for host in os.getenv("OLLAMA_HOSTS", "").split(",") if host.strip()]
+        self.max_inflight = min(
+            int(os.getenv("OLLAMA_ENDPOINT_MAX_INFLIGHT", "4")), int(os.getenv("OLLAMA_MAX_CONCURRENCY", "8"))
+        )
+        self.cooldown = float(os.getenv("OLLAMA_ENDPOINT_COOLDOWN_SECONDS", "30"))
+        self.timeout = float(os.getenv("OLLAMA_REQUEST_TIMEOUT_SECONDS", "300"))
+
+        # no hosts configured: one endpoint using the ollama client default (OLLAMA_HOST or localhost).
+        self.endpoints = [_Endpoint(logger, host, self.max_inflight, self.timeout) for host in hosts or [None]]
+        self._cond = asyncio.Condition()
+
+        self.logger.info(
+            f"{OllamaBalancer.__name__} initiated with {len(self.endpoints)} endpoints: "
+            f"{[endpoint.name for endpoint in self.endpoints]} (max_inflight={self.max_inflight} each, timeout={self.timeout:.0f}s)."
+        )
+
+
+    def _pick(self, tried: set) -> _Endpoint | None:
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.name not in tried and e.available(now)]
+        if not candidates:
+            return None
+        # least outstanding requests, then least used so idle endpoints share the load evenly.
+        return min(candidates, key=lambda e: (e.in_flight, e.completed))
+
+
+    async def _acquire(self, tried: set):
+        async with self._cond:
+            while True:
+                endpoint = self._pick(tried)
+                if endpoint is not None:
+                    return endpoint, endpoint.limiter.start()
+
+                remaining = [e for e in self.endpoints if e.name not in tried]
+                if not remaining:
+                    raise RuntimeError("All Ollama endpoints failed for this request")
+
+                # wait for a slot to free up, or for the earliest cooldown to expire.
+                now = time.monotonic()
+                cooling = [e.down_until - now for e in remaining if e.down_until > now]
+                timeout = min(cooling) if len(cooling) == len(remaining) else None
+                # a failover request can take a wake-up for an endpoint it already tried, re-check on its own.
+                if timeout is None and tried:
+                    timeout = 1.0
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=timeout)
+                except TimeoutError:
+                    pass
+
+
+    def _free_slots(self) -> int:
+        now = time.monotonic()
+        return sum(max(e.limiter.limit - e.in_flight, 0) for e in self.endpoints if e.down_until <= now)
+
+
+    async def _release(self, endpoint: _Endpoint, sample, failed: bool) -> None:
+        # bookkeeping first so a cancelled request can never leak an in-flight slot.
+        endpoint.limiter.finish(sample, failed)
+        if failed and len(self.endpoints) == 1:
+            # nothing to fail over to, a cooldown would only stall every request.
+            endpoint.failures += 1
+        elif failed:
+            endpoint.failures += 1
+            backoff = self.cooldown * min(2 ** (endpoint.failures - 1), 8)
+            endpoint.down_until = time.monotonic() + backoff
+            self.logger.warning(
+                f"Ollama endpoint {endpoint.name} failed {endpoint.failures} times in a row, "
+                f"out of rotation for {backoff:.0f}s."
+            )
+        else:
+            endpoint.failures = 0
+            endpoint.completed += 1
+
+        async with self._cond:
+            # only as many waiters as there are free slots, waking all of them is quadratic.
+            self._cond.notify(self._free_slots())
+
+
+    async def chat(self, **kwargs):
+        """Same arguments as AsyncClient.chat, retried on the next endpoint when one fails."""
+        tried = set()
+        while True:
+            endpoint, sample = await self._acquire(tried)
+            failed = False
+            try:
+                response = await endpoint.client.chat(**kwargs)
+                # token counts drive the endpoint's concurrency.
+                sample.observe(response)
+                return response
+            except Exception as e:
+                failed = True
+                tried.add(endpoint.name)
+                if len(tried) == len(self.endpoints):
+                    raise
+                self.logger.warning(f"Ollama endpoint {endpoint.name} error: {e}, failing over.")
+            finally:
+                await self._release(endpoint, sample, failed=failed)
+
+
+    def stats(self) -> dict:
+        return {
+            endpoint.name: {
+                "in_flight": endpoint.in_flight,
+                "limit": endpoint.limiter.limit,
+                "completed": endpoint.completed,
+                "failures": endpoint.failures,
+            }
+            for endpoint in self.endpoints
+        }
@@ -1,163 +1,292 @@
-from ollama import Client   # Native Ollama client
-import psycopg2
+from ollama import AsyncClient   # Native Ollama client
 import psycopg2.extras
 from pprint import pformat
 from pathlib import Path
 import textwrap
 from datetime import datetime
+import asyncio
+import hashlib
 import json
 import os
+import time
 from dotenv import load_dotenv
 load_dotenv()
 
+from tools.DBPool import DBPool
+
 # from tools.writeReport import write_report
 
+SYSTEM_PROMPT = "You are a precise, data-driven job market analyst. Generate reports using ONLY the provided data. Never invent information."
+
+# report sections in output order: (heading, insights keys, instruction), generated in parallel.
+REPORT_SECTIONS = {
+    "overview": (
+        "Market Overview",
+        ["keyword", "total_jobs", "top_job_titles", "top_skills"],
+        "Write a short executive summary of the job market for this keyword: demand and the key takeaways.",
+    ),
+    "job_titles": (
+        "Job Titles",
+        ["keyword", "total_jobs", "top_job_titles"],
+        "Analyse the most common job titles and what they say about the roles in demand.",
+    ),
+    "skills": (
+        "Skills in Demand",
+        ["keyword", "total_jobs", "top_skills"],
+        "Analyse the most requested technical and soft skills.",
+    ),
+    "responsibilities": (
+        "Typical Responsibilities",
+        ["keyword", "top_responsibilities"],
+        "Summarize the most common job responsibilities.",
+    ),
+    "requirements": (
+        "Qualifications and Experience",
+        ["keyword", "top_qualifications", "top_experiences"],
+        "Summarize the qualifications and years of experience employers ask for.",
+    ),
+}
+
+
 class OllamaResearcher:
-    def __init__(self, logger):
+    def __init__(self, logger, pool: DBPool | None = None):
         self.logger = logger
 
-        # Database connection (using psycopg2 directly - faster & safer)
-        self.username = os.getenv("username")
-        self.password = os.getenv("password")
-        self.host = os.getenv("host")
-        self.port = os.getenv("port")
-        self.db_name = os.getenv("db_name")
-
-        if not all([self.username, self.password, self.host, self.port, self.db_name]):
-            raise ValueError("Missing database credentials in .env")
-
-        self.conn = psycopg2.connect(
-            dbname=self.db_name,
-            user=self.username,
-            password=self.password,
-            host=self.host,
-            port=self.port
-        )
-        self.conn.autocommit = True
+        # Database connection (pooled psycopg2, shared with DBHandler when given)
+        self._owns_pool = pool is None
+        self.pool = pool or DBPool(logger=logger)
+
+        # number of items per top-N list in the report.
+        self.report_limits = {
+            "job_title": 10,
+            "skills": 10,
+            "responsibilities": 20,
+            "qualifications": 5,
+            "experiences": 5,
+        }
 
         # Ollama setup
         self.model_name = os.getenv("OLLAMA_SUMMARIZATION_MODEL")
-        self.client = Client()   # or AsyncClient() if you want async
+        self.client = AsyncClient()
+        self.section_num_predict = int(os.getenv("REPORT_SECTION_NUM_PREDICT", "1024"))
+        self.report_path = os.getenv("REPORT_PATH", "./reports/")
+        # reports of unchanged keywords are served from report_cache.
+        self.use_cache = os.getenv("REPORT_CACHE", "true").lower() == "true"
+        self.create_table()
 
         self.logger.info(f"Ollama Researcher initialized with model: {self.model_name}")
 
 
-    def _get_top_job_titles(self, keyword: str, limit: int = 15):
+    def _get_report_stats(self, keyword: str) -> dict:
+        """Fetch the total job count and every top-N list for a keyword in one round-trip."""
+        # job_term_counts is maintained by triggers on JobAd, so this is an index scan per list
+        # regardless of how many job ads are stored.
         query = """
-            SELECT job_title, COUNT(*) as count
-            FROM public.jobad
-            WHERE keyword = %s AND job_title IS NOT NULL
-            GROUP BY job_title
-            ORDER BY count DESC
-            LIMIT %s;
+            SELECT 'total_jobs' AS category, NULL AS item, COALESCE(SUM(count), 0) AS count
+            FROM job_term_counts
+            WHERE keyword = %(keyword)s AND column_name = 'job_title'
+            UNION ALL
+            SELECT l.column_name, top.term, top.count
+            FROM (VALUES
+                ('job_title', %(job_title)s),
+                ('skills', %(skills)s),
+                ('responsibilities', %(responsibilities)s),
+                ('qualifications', %(qualifications)s),
+                ('experiences', %(experiences)s)
+            ) AS l(column_name, lim),
+            LATERAL (
+                SELECT c.term, c.count
+                FROM job_term_counts c
+                WHERE c.keyword = %(keyword)s AND c.column_name = l.column_name AND c.count > 0
+                ORDER BY c.count DESC
+                LIMIT l.lim
+            ) AS top;
         """
-        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(query, (keyword, limit))
-            return cur.fetchall()
-
-
-    def _get_top_items(self, keyword: str, column: str, limit: int = 20):
-        query = f"""
-            SELECT element, COUNT(*) as freq
-            FROM (
-                SELECT unnest({column}) AS element
-                FROM public.jobad
-                WHERE keyword = %s 
-                  AND {column} IS NOT NULL 
-                  AND array_length({column}, 1) > 0
-            ) sub
-            WHERE element IS NOT NULL AND TRIM(element) != ''
-            GROUP BY element
-            ORDER BY freq DESC
-            LIMIT %s;
-        """
-        with self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-            cur.execute(query, (keyword, limit))
-            return cur.fetchall()
-
+        with self.pool.connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(query, {"keyword": keyword, **self.report_limits})
+            rows = cur.fetchall()
 
-    def _write_report(self, keyword: str, markdown: str) -> None:
-        
-        # generate filename by daily press release url.
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"Job_Report_keyword-{keyword}_{ts}.md"
-        filepath = "./reports/"
-        
-        # generate report in text file.
-        with open(os.path.join(filepath, filename), "w", encoding="utf-8") as file:
-            file.write(markdown + "\n")
-            
-        return
+        stats = {"total_jobs": 0, **{category: [] for category in self.report_limits}}
+        for row in rows:
+            if row["category"] == "total_jobs":
+                stats["total_jobs"] = row["count"]
+            else:
+                stats[row["category"]].append({"item": row["item"], "count": row["count"]})
+        for category in self.report_limits:
+            stats[category].sort(key=lambda r: r["count"], reverse=True)
 
+        return stats
 
-    def generate_job_market_report(self, keyword: str) -> None:
-        self.logger.info(f"Generating job market report for keyword: '{keyword}'")
 
+    def create_table(self) -> None:
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS report_cache (
+            key TEXT PRIMARY KEY,
+            keyword TEXT NOT NULL,
+            model TEXT NOT NULL,
+            report TEXT NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        );
+        """
         try:
-            # 1. Fetch data efficiently
-            job_titles = self._get_top_job_titles(keyword, 10)
-            skills = self._get_top_items(keyword, "skills", 10)
-            responsibilities = self._get_top_items(keyword, "responsibilities", 20)
-            qualifications = self._get_top_items(keyword, "qualifications", 5)
-            experiences = self._get_top_items(keyword, "experiences", 5)
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(create_table_query)
+            self.logger.info("Table report_cache created (or already exists)")
+        except Exception as e:
+            self.logger.error(f"Failed to create report_cache: {e}")
+            raise
 
-            total_jobs = sum(row["count"] for row in job_titles)
 
-            # 2. Prepare clean insights (much smaller than before)
-            insights = {
-                "keyword": keyword,
-                "total_jobs": total_jobs,
-                "top_job_titles": [{"title": r["job_title"], "count": r["count"]} for r in job_titles],
-                "top_skills": [{"skill": r["element"], "count": r["freq"]} for r in skills],
-                "top_responsibilities": [{"item": r["element"], "count": r["freq"]} for r in responsibilities],
-                "top_qualifications": [{"item": r["element"], "count": r["freq"]} for r in qualifications],
-                "top_experiences": [{"item": r["element"], "count": r["freq"]} for r in experiences]
-            }
+    def _cache_key(self, insights: dict) -> str:
+        # same term counts, model, prompts and output budget -> same report.
+        payload = json.dumps(
+            {
+                "insights": insights,
+                "model": self.model_name,
+                "system": SYSTEM_PROMPT,
+                "sections": REPORT_SECTIONS,
+                "num_predict": self.section_num_predict,
+            },
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
-            # 3. Strong system + user prompt
-            system_prompt = "You are a precise, data-driven job market analyst. Generate reports using ONLY the provided data. Never invent information."
 
-            user_prompt = f"""Generate a professional Job Market Research Report based on the following data.
+    def _get_cached_report(self, key: str) -> str | None:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT report FROM report_cache WHERE key = %s", (key,))
+            row = cur.fetchone()
+        return row[0] if row else None
 
-            Data:
-            {json.dumps(insights, indent=2, ensure_ascii=False)}
 
-            Rules:
-            - Use only the exact items and counts from the data above.
-            - Do not add any job titles, skills, or experiences that are not listed.
-            - Be factual and specific.
-            - Output in clean Markdown format.
+    def _put_cached_report(self, key: str, keyword: str, report: str) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO report_cache (key, keyword, model, report) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (key) DO UPDATE SET report = EXCLUDED.report, created_at = NOW();
+                """,
+                (key, keyword, self.model_name, report),
+            )
+
+
+    def _report_filepath(self, keyword: str) -> str:
+        os.makedirs(self.report_path, exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(self.report_path, f"Job_Report_keyword-{keyword}_{ts}.md")
+
 
-            Return the full report in Markdown.
-            """
+    async def _stream_section(self, name: str, insights: dict, queue: asyncio.Queue) -> None:
+        # map step: one section from its slice of the insights, streamed chunk by chunk into its queue.
+        _, keys, instruction = REPORT_SECTIONS[name]
+        data = {key: insights[key] for key in keys}
+        user_prompt = f"""{instruction}
 
-            # 4. Call Ollama directly
-            response = self.client.chat(
+        Data:
+        {json.dumps(data, indent=2, ensure_ascii=False)}
+
+        Rules:
+        - Use only the exact items and counts from the data above.
+        - Do not add any job titles, skills, or experiences that are not listed.
+        - Be factual and specific.
+        - Output clean Markdown without a top-level heading.
+        """
+        try:
+            stream = await self.client.chat(
                 model=self.model_name,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": user_prompt}
                 ],
+                stream=True,
                 options={
                     "temperature": 0.0,      # Very important for factual report
-                    "num_ctx": 16384,
-                    "num_predict": 4096,     # Allow long report
+                    "num_ctx": 8192,
+                    "num_predict": self.section_num_predict,
                 }
             )
+            async for part in stream:
+                await queue.put(part["message"]["content"])
+        finally:
+            await queue.put(None)
+
+
+    async def _write_stream(self, filepath: str, keyword: str, queues: dict[str, asyncio.Queue], echo: bool) -> str:
+        # reduce step: sections are written in order, the current one live while later ones buffer.
+        parts = []
+        with open(filepath, "w", encoding="utf-8") as file:
+            def write(text: str) -> None:
+                parts.append(text)
+                file.write(text)
+                file.flush()
+                if echo:
+                    print(text, end="", flush=True)
+
+            write(f"# Job Market Research Report: {keyword}\n")
+            for name, queue in queues.items():
+                write(f"\n## {REPORT_SECTIONS[name][0]}\n\n")
+                while (chunk := await queue.get()) is not None:
+                    write(chunk)
+            write("\n")
+
+        return "".join(parts)
+
+
+    async def generate_job_market_report(self, keyword: str, echo: bool = False) -> str:
+        """
+        Write the report for a keyword to REPORT_PATH and return it. Sections are generated in
+        parallel and streamed to the file (and the console with echo); an unchanged keyword is
+        served from the report cache.
+        """
+        self.logger.info(f"Generating job market report for keyword: '{keyword}'")
+        start = time.perf_counter()
+
+        try:
+            # 1. Fetch data efficiently (single round-trip)
+            stats = await asyncio.to_thread(self._get_report_stats, keyword)
+
+            # 2. Prepare clean insights (much smaller than before)
+            insights = {
+                "keyword": keyword,
+                "total_jobs": stats["total_jobs"],
+                "top_job_titles": [{"title": r["item"], "count": r["count"]} for r in stats["job_title"]],
+                "top_skills": [{"skill": r["item"], "count": r["count"]} for r in stats["skills"]],
+                "top_responsibilities": stats["responsibilities"],
+                "top_qualifications": stats["qualifications"],
+                "top_experiences": stats["experiences"]
+            }
+            filepath = self._report_filepath(keyword)
+
+            # 3. Unchanged data: reuse the last report for the same insights and model.
+            key = self._cache_key(insights)
+            cached = await asyncio.to_thread(self._get_cached_report, key) if self.use_cache else None
+            if cached is not None:
+                with open(filepath, "w", encoding="utf-8") as file:
+                    file.write(cached)
+                if echo:
+                    print(cached, flush=True)
+                self.logger.info(f"Report cache hit for '{keyword}', written to {filepath}")
+                return cached
+
+            # 4. Generate every section in parallel, stream them to the file in order.
+            queues = {name: asyncio.Queue() for name in REPORT_SECTIONS}
+            async with asyncio.TaskGroup() as tg:
+                for name, queue in queues.items():
+                    tg.create_task(self._stream_section(name, insights, queue))
+                writer = tg.create_task(self._write_stream(filepath, keyword, queues, echo))
+            report_text = writer.result()
+
+            if self.use_cache:
+                await asyncio.to_thread(self._put_cached_report, key, keyword, report_text)
+            self.logger.debug("Report generated: \n%s", report_text)
+            self.logger.info(f"Report for '{keyword}' written to {filepath} in {time.perf_counter() - start:.1f}s")
 
-            report_text = response['message']['content']
-            self.logger.info("#"*50)
-            self.logger.info("Report generated: \n%s", report_text)
-            self.logger.info("#"*50)
-            self._write_report(keyword=keyword, markdown=report_text)
-            
-            return
+            return report_text
 
         except Exception as e:
             self.logger.error(f"Failed to generate report for '{keyword}': {e}")
             raise
 
     def close(self):
-        if self.conn and not self.conn.closed:
-            self.conn.close()
-            self.logger.info("Database connection closed.")
\ No newline at end of file
+        if self._owns_pool:
+            self.pool.close()
\ No newline at end of file
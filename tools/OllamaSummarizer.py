@@ -1,9 +1,20 @@
-from ollama import AsyncClient
 from crawl4ai import CrawlResult
 
-from tools.DataClass import JobInfo, ExtractedJobInfo
+from tools.DataClass import JobInfo, ExtractedJobInfo, CrawledJob, job_id_from_url
+from tools.ExtractionCache import ExtractionCache
+from tools.OllamaBalancer import OllamaBalancer
+from tools.MarkdownTrimmer import MarkdownTrimmer
+from tools.RuleExtractor import RuleExtractor
+from tools.Metrics import metrics
+
+from pydantic import BaseModel, ValidationError
 
 import asyncio
+import json
+import logging
+import random
+import time
+import re
 from pprint import pformat
 from typing import List
 import os
@@ -12,6 +23,41 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def repair_json(text: str) -> str:
+    """Best-effort repair of truncated LLM json: close open strings, drop dangling keys, close brackets."""
+    text = re.sub(r"^\s*```(?:json)?|```\s*$", "", text).strip()
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("no json object in model output")
+    text = text[start:]
+
+    stack = []
+    in_string = False
+    escape = False
+    for char in text:
+        if escape:
+            escape = False
+        elif char == "\\":
+            escape = in_string
+        elif char == '"':
+            in_string = not in_string
+        elif not in_string and char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif not in_string and char in "}]" and stack:
+            stack.pop()
+
+    if escape:
+        text = text[:-1]
+    if in_string:
+        text += '"'
+    # a truncated object may end in a dangling key, "key": or a trailing comma.
+    if stack and stack[-1] == "}":
+        text = re.sub(r'(?:,|(?<=\{))\s*"[^"]*"\s*:?\s*$', "", text)
+    text = re.sub(r",\s*$", "", text)
+
+    return text + "".join(reversed(stack))
+
+
 class OllamaSummarizer:
     def __init__(self, logger):
         self.logger = logger
@@ -19,13 +65,47 @@ class OllamaSummarizer:
         if not self.model_name:
             raise ValueError("OLLAMA_EXTRACTION_MODEL not set in .env file")
         
-        self.client = AsyncClient()
+        # requests are spread over every model server listed in OLLAMA_HOSTS, with in-flight
+        # requests tuned per server at runtime from observed throughput instead of a fixed semaphore.
+        self.client = OllamaBalancer(logger=logger)
+        # identical job ad text (reposts, overlapping keywords) is only ever sent to the llm once.
+        self.cache = None
+        if os.getenv("EXTRACTION_CACHE", "true").lower() == "true":
+            self.cache = ExtractionCache(logger=logger, model_name=self.model_name)
+        # strip links/boilerplate before prompting, prompt eval dominates on cpu nodes.
+        self.trimmer = MarkdownTrimmer(logger=logger)
+        self.num_predict = 1500
+        # bounded retries with exponential backoff + jitter, then a later retry pass.
+        self.max_retries = int(os.getenv("OLLAMA_MAX_RETRIES", "3"))
+        self.retry_base_delay = float(os.getenv("OLLAMA_RETRY_BASE_DELAY", "2"))
+        # fill title/company/location/salary from markup, the llm only extracts the rest.
+        self.rules = None
+        if os.getenv("RULE_EXTRACTION", "true").lower() == "true":
+            self.rules = RuleExtractor(logger=logger)
         self.logger.info(f"Ollama Summarizer initialized with model: {self.model_name}")
 
-    async def _summarize_job_info(self, result: CrawlResult, keyword: str) -> JobInfo:
+    async def _summarize_job_info(self, result: CrawlResult | CrawledJob, keyword: str, failed: list | None = None) -> JobInfo | None:
         url = result.url
-        job_id = url.split("/")[-1].split("?")[0]
+        job_id = job_id_from_url(url)
         content = result.markdown
+        trimmed = self.trimmer.trim(content)
+
+        cached = self.cache.get(trimmed) if self.cache else None
+        if cached is not None:
+            self.logger.debug(f"Extraction cache hit for job {job_id}")
+            return JobInfo(
+                id=job_id,
+                url=url,
+                content=content,
+                keyword=keyword,
+                job_info=cached,
+                embedding=None,
+            )
+
+        # fields found by the rules are removed from the schema the llm has to fill.
+        rule_fields = self.rules.extract(result) if self.rules else {}
+        schema = RuleExtractor.remaining_model(frozenset(rule_fields)) if rule_fields else ExtractedJobInfo
+        num_predict = RuleExtractor.num_predict_for(schema, self.num_predict) if rule_fields else self.num_predict
 
         # Strong, clear prompt for extraction
         prompt = f"""You are an expert job information extractor.
@@ -36,25 +116,16 @@ class OllamaSummarizer:
         Return ONLY valid JSON matching this schema. Do not add explanations.
 
         Job Content:
-        {content}
+        {trimmed}
         """
 
+        start = time.perf_counter()
         try:
-            response = await self.client.chat(
-                model=self.model_name,                    # ← This was becoming None before
-                messages=[{'role': 'user', 'content': prompt}],
-                format=ExtractedJobInfo.model_json_schema(),   # Native structured output
-                options={
-                    'temperature': 0.0,
-                    'num_ctx': 16384,      # Good for long job descriptions
-                    'num_predict': 1500,
-                }
-            )
-
-            # Parse the JSON response directly into your Pydantic model
-            extracted = ExtractedJobInfo.model_validate_json(
-                response['message']['content']
-            )
+            extracted = await self._request_extraction(prompt, schema, num_predict, job_id)
+            if rule_fields:
+                extracted = ExtractedJobInfo(**{**extracted.model_dump(), **rule_fields})
+            if self.cache:
+                self.cache.put(trimmed, extracted)
 
             job_info = JobInfo(
                 id=job_id,
@@ -65,46 +136,109 @@ class OllamaSummarizer:
                 embedding=None,   # To be filled later
             )
 
-            self.logger.info("Successfully extracted job: \n%s", pformat(job_info.model_dump(), indent=4))
-            self.logger.info("#"*50)
-            
+            metrics.incr("extracted_jobs_total")
+            metrics.observe("extraction", time.perf_counter() - start)
+            self.logger.info(f"Extracted job {job_id} in {time.perf_counter() - start:.1f}s")
+            # the full payload is only formatted when debug logging is on.
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("Extracted job payload: \n%s", pformat(job_info.model_dump(exclude={"content"}), indent=4))
+
             return job_info
 
         except Exception as e:
-            self.logger.error(f"Failed to extract job {job_id}: {e}")
-            # Fallback: return basic info so the pipeline doesn't crash
-            return JobInfo(
-                id=job_id,
-                url=url,
-                content=content,
-                keyword=keyword,
-                job_info=ExtractedJobInfo(
-                    job_title=None,
-                    company=None,
-                    responsibilities=None,
-                    qualifications=None,
-                    experiences=None,
-                    skills=None,
-                    salary=None,
-                    working_location=None,
-                ),
-                embedding=None,
-            )
+            metrics.incr("extraction_failures_total")
+            # never return an empty JobInfo: it would overwrite good data on upsert.
+            self.logger.error(f"Failed to extract job {job_id} after {self.max_retries} attempts, queued for retry pass: {e}")
+            # the caller's own list, so concurrent runs don't retry each other's jobs; no html kept.
+            if failed is not None:
+                failed.append((CrawledJob(url=url, markdown=str(content or "")), keyword))
+            return None
+
+    def _parse_extraction(self, schema: type[BaseModel], text: str) -> BaseModel:
+        try:
+            return schema.model_validate_json(text)
+        except ValidationError:
+            # truncated or sloppy output: repair it and default missing list fields to empty.
+            data = json.loads(repair_json(text))
+            for name, field in schema.model_fields.items():
+                if data.get(name) is None and field.is_required() and getattr(field.annotation, "__origin__", None) is list:
+                    data[name] = []
+            return schema.model_validate(data)
+
+    @staticmethod
+    def _record_usage(response) -> None:
+        # ollama reports token counts and durations (ns) with every response.
+        metrics.incr("llm_requests_total")
+        metrics.incr("llm_prompt_eval_tokens_total", response.get("prompt_eval_count") or 0)
+        metrics.incr("llm_eval_tokens_total", response.get("eval_count") or 0)
+        metrics.incr("llm_prompt_eval_seconds_total", (response.get("prompt_eval_duration") or 0) / 1e9)
+        metrics.incr("llm_eval_seconds_total", (response.get("eval_duration") or 0) / 1e9)
+        metrics.observe("llm_request", (response.get("total_duration") or 0) / 1e9)
+
+    async def _request_extraction(self, prompt: str, schema: type[BaseModel], num_predict: int, job_id: str) -> BaseModel:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                response = await self.client.chat(
+                    model=self.model_name,                    # ← This was becoming None before
+                    messages=[{'role': 'user', 'content': prompt}],
+                    format=schema.model_json_schema(),   # Native structured output
+                    options={
+                        'temperature': 0.0,
+                        'num_ctx': self.trimmer.num_ctx_for(prompt, num_predict),   # sized from the trimmed prompt
+                        'num_predict': num_predict,
+                    }
+                )
+                self._record_usage(response)
+
+                # Parse the JSON response directly into your Pydantic model
+                return self._parse_extraction(schema, response['message']['content'])
+
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                # exponential backoff with jitter so retries from many workers don't arrive together.
+                delay = self.retry_base_delay * 2 ** (attempt - 1) * (0.5 + random.random())
+                self.logger.warning(f"Extraction attempt {attempt} for job {job_id} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def retry_failed(self, failed: list[tuple[CrawledJob, str]]) -> List[JobInfo]:
+        """Give every job that exhausted its retries one more pass, e.g. after the model server recovered."""
+        if not failed:
+            return []
+
+        self.logger.info(f"Retry pass for {len(failed)} failed jobs...")
+        still_failed = []
+        job_infos = await asyncio.gather(*[self._summarize_job_info(result, keyword, still_failed) for result, keyword in failed])
+        recovered = [job_info for job_info in job_infos if job_info is not None]
+        # whatever still fails is dropped for this run; incremental mode picks it up next time.
+        self.logger.info(
+            f"Retry pass recovered {len(recovered)}/{len(failed)} jobs. "
+            f"Still failing: {[job_id_from_url(result.url) for result, _ in still_failed]}"
+        )
+
+        return recovered
+
+    async def summarize_job(self, result: CrawlResult | CrawledJob, keyword: str, failed: list | None = None) -> JobInfo | None:
+        # concurrency is bounded by the per-endpoint adaptive limiters of the balancer.
+        # jobs that exhaust their retries are appended to failed, for retry_failed(failed).
+        return await self._summarize_job_info(result, keyword, failed)
 
     async def summarize_all_jobs(self, results: List[CrawlResult], keyword: str) -> List[JobInfo]:
         self.logger.info(f"Starting extraction for {len(results)} jobs...")
 
-        semaphore = asyncio.Semaphore(4)   # Tune this (3~6) based on your GPU/RAM
-
-        async def bounded_extract(result: CrawlResult):
-            async with semaphore:
-                return await self._summarize_job_info(result, keyword)
-
-        tasks = [bounded_extract(result) for result in results]
+        failed = []
+        tasks = [self.summarize_job(result, keyword, failed) for result in results]
         job_infos = await asyncio.gather(*tasks, return_exceptions=True)
 
-        # Remove any exceptions
-        successful = [j for j in job_infos if not isinstance(j, Exception)]
+        # Remove any exceptions and failed jobs, then give the failed ones a second pass
+        successful = [j for j in job_infos if j is not None and not isinstance(j, Exception)]
+        successful += await self.retry_failed(failed)
         self.logger.info(f"Extraction completed. {len(successful)}/{len(results)} jobs succeeded.")
+        self.trimmer.log_stats()
+
+        return successful
 
-        return successful
\ No newline at end of file
+    def close(self):
+        self.trimmer.log_stats()
+        if self.cache:
+            self.cache.close()
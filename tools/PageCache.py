@@ -0,0 +1,112 @@
+from crawl4ai import CrawlResult
+
+from tools.Metrics import metrics
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class PageCache:
+    """
+    Persistent SQLite cache of crawled job pages for conditional re-fetching.
+
+    For every url it keeps the ETag / Last-Modified validators the server sent and a
+    fingerprint of the markdown extracted from the target elements. A 304 on a conditional
+    request, or an identical fingerprint after a full crawl, means the job ad is unchanged.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.path = os.getenv("PAGE_CACHE_PATH", "./cache/page_cache.db")
+
+        self.not_modified = 0       # answered 304 to a conditional request
+        self.unchanged = 0          # crawled again, same fingerprint
+        self.changed = 0            # new or different content
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.create_table()
+
+        self.logger.info(f"{PageCache.__name__} initiated at {self.path}.")
+
+
+    def create_table(self) -> None:
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS page_cache (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fingerprint TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+
+    @staticmethod
+    def fingerprint(markdown: str) -> str:
+        # only whitespace differences between two renders are not a change.
+        return hashlib.sha256(re.sub(r"\s+", " ", markdown or "").strip().encode("utf-8")).hexdigest()
+
+
+    def conditional_headers(self, url: str) -> dict:
+        """If-None-Match / If-Modified-Since headers for a url, empty when nothing is cached."""
+        row = self.conn.execute("SELECT etag, last_modified FROM page_cache WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return {}
+        headers = {}
+        etag, last_modified = row
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+
+    def record_not_modified(self, url: str) -> None:
+        self.not_modified += 1
+        metrics.incr("page_cache_hits_total")
+        with self.conn:
+            self.conn.execute("UPDATE page_cache SET updated_at = ? WHERE url = ?", (time.time(), url))
+
+
+    def update(self, result: CrawlResult) -> bool:
+        """Store the validators and fingerprint of a crawled page. Returns True if the content changed."""
+        headers = {key.lower(): value for key, value in (result.response_headers or {}).items()}
+        fingerprint = self.fingerprint(str(result.markdown or ""))
+        row = self.conn.execute("SELECT fingerprint FROM page_cache WHERE url = ?", (result.url,)).fetchone()
+        with self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO page_cache (url, etag, last_modified, fingerprint, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (url) DO UPDATE SET
+                    etag = COALESCE(excluded.etag, page_cache.etag),
+                    last_modified = COALESCE(excluded.last_modified, page_cache.last_modified),
+                    fingerprint = excluded.fingerprint,
+                    updated_at = excluded.updated_at
+                """,
+                (result.url, headers.get("etag"), headers.get("last-modified"), fingerprint, time.time()),
+            )
+
+        changed = row is None or row[0] != fingerprint
+        if changed:
+            self.changed += 1
+            metrics.incr("page_cache_misses_total")
+        else:
+            self.unchanged += 1
+            metrics.incr("page_cache_hits_total")
+        return changed
+
+
+    def close(self) -> None:
+        self.conn.close()
+        self.logger.info(
+            f"Page cache closed ({self.not_modified} not modified, {self.unchanged} unchanged, {self.changed} changed)."
+        )
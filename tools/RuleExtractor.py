@@ -0,0 +1,103 @@
+from crawl4ai import CrawlResult
+from lxml import html as lxml_html
+from pydantic import BaseModel, create_model
+
+from tools.DataClass import ExtractedJobInfo, CrawledJob
+
+from functools import lru_cache
+import re
+
+
+# jobsdb marks the structured parts of a job ad with data-automation attributes.
+FIELD_XPATHS = {
+    "job_title": '//h1[@data-automation="job-detail-title"]',
+    "company": '//*[@data-automation="advertiser-name"]',
+    "working_location": '//*[@data-automation="job-detail-location"]',
+    "salary": '//*[@data-automation="job-detail-salary"]',
+}
+
+_AMOUNT = r"(?:HK)?\$\s?\d[\d,.]*\s?[kKmM]?"
+_PERIOD = r"\s*(?:per|/|a)\s*(?:month|mth|annum|year|hour|day)"
+# a salary is an amount range and/or an amount per period, a lone "$5M budget" is not.
+SALARY_PATTERN = re.compile(
+    rf"{_AMOUNT}\s*(?:-|–|to)\s*(?:{_AMOUNT}|\d[\d,.]*\s?[kKmM]?)(?:{_PERIOD})?|{_AMOUNT}{_PERIOD}",
+    re.IGNORECASE,
+)
+
+# rough share of the answer each field takes, list fields dominate the output tokens.
+FIELD_WEIGHTS = {
+    "job_title": 1,
+    "company": 1,
+    "salary": 1,
+    "working_location": 1,
+    "responsibilities": 4,
+    "qualifications": 4,
+    "experiences": 4,
+    "skills": 4,
+}
+
+
+class RuleExtractor:
+    """
+    Deterministic extraction of the fields jobsdb renders in predictable markup
+    (title, company, location, salary), so the LLM only has to produce the rest.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.logger.info(f"{RuleExtractor.__name__} initiated.")
+
+
+    @staticmethod
+    def _text(tree, xpath: str) -> str | None:
+        nodes = tree.xpath(xpath)
+        if not nodes:
+            return None
+        text = re.sub(r"\s+", " ", nodes[0].text_content()).strip()
+        return text or None
+
+
+    def extract(self, result: CrawlResult | CrawledJob) -> dict:
+        """Return the fields that could be extracted without the LLM."""
+        fields = {}
+        if result.html:
+            try:
+                tree = lxml_html.fromstring(result.html)
+                for field, xpath in FIELD_XPATHS.items():
+                    value = self._text(tree, xpath)
+                    if value:
+                        fields[field] = value
+            except Exception as e:
+                self.logger.warning(f"Rule extraction failed to parse html of {result.url}: {e}")
+
+        markdown = result.markdown or ""
+        if "job_title" not in fields:
+            # target element h1[data-automation="job-detail-title"] renders as the first heading.
+            match = re.search(r"^#\s+(.+)$", markdown, re.MULTILINE)
+            if match:
+                fields["job_title"] = match.group(1).strip()
+        if "salary" not in fields:
+            match = SALARY_PATTERN.search(markdown)
+            if match:
+                fields["salary"] = match.group(0).strip()
+
+        return fields
+
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def remaining_model(known_fields: frozenset) -> type[BaseModel]:
+        """ExtractedJobInfo reduced to the fields the rules did not fill."""
+        remaining = {
+            name: (field.annotation, field)
+            for name, field in ExtractedJobInfo.model_fields.items()
+            if name not in known_fields
+        }
+        return create_model("RemainingJobInfo", **remaining)
+
+
+    @staticmethod
+    def num_predict_for(model: type[BaseModel], full_num_predict: int) -> int:
+        """Scale the output token budget to the share of fields left for the LLM."""
+        total = sum(FIELD_WEIGHTS.values())
+        remaining = sum(FIELD_WEIGHTS.get(name, 1) for name in model.model_fields)
+        return max(int(full_num_predict * remaining / total), 256)
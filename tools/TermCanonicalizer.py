@@ -0,0 +1,301 @@
+import numpy as np
+import psycopg2.extras
+
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from tools.DataClass import JobInfo
+from tools.DBPool import DBPool
+
+
+# columns with canonical forms stored next to the raw llm output.
+CANONICAL_COLUMNS = ("skills", "qualifications", "experiences")
+
+# filler words the llm wraps around the actual skill or qualification.
+FILLER_PATTERN = re.compile(
+    r"\b(?:strong|good|excellent|solid|basic|advanced|proven|hands on|working|in depth|"
+    r"knowledge of|knowledge in|knowledge|proficiency in|proficient in|proficient|familiarity with|familiar with|"
+    r"experience with|experience in|skills?|programming languages?|programming|abilities|ability to|ability)\b"
+)
+VERSION_PATTERN = re.compile(r"(?<![\w.])v?\d+(?:\.\d+)*\+?(?![\w.])")
+# "python3", "python 3.11" -> "python"
+VERSION_PATTERN_ATTACHED = re.compile(r"(?<=[a-z]{4})\d+(?:\.\d+)*\b")
+YEARS_PATTERN = re.compile(r"(\d+)\s*\+?\s*(?:(?:-|to)?\s*(\d+)\s*)?(?:years?|yrs?)\b(?:\s*of)?")
+# the preposition after "experience" goes with it: "experience in data engineering" -> "data engineering"
+EXPERIENCE_PATTERN = re.compile(
+    r"\b(?:of\s+)?(?:relevant|working|related|professional|solid|proven)?\s*experiences?\b(?:\s+(?:in|with|of|on)\b)?"
+)
+
+# spelling variants that trigram similarity can't link. keys and targets are in normalized form.
+ALIASES = {
+    "js": "javascript",
+    "ts": "typescript",
+    "node": "node.js",
+    "nodejs": "node.js",
+    "reactjs": "react",
+    "react.js": "react",
+    "vuejs": "vue",
+    "vue.js": "vue",
+    "postgres": "postgresql",
+    "k8s": "kubernetes",
+    "golang": "go",
+    "dotnet": ".net",
+    "dot net": ".net",
+    "ms excel": "excel",
+    "microsoft excel": "excel",
+    "ms office": "microsoft office",
+    "amazon web services": "aws",
+    "google cloud": "gcp",
+    "google cloud platform": "gcp",
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "nlp": "natural language processing",
+    "cantonese and english": "english and cantonese",
+    "bachelor degree": "bachelors degree",
+    "degree holder": "bachelors degree",
+}
+
+
+class TermCanonicalizer:
+    """
+    Map the free-text skills / qualifications / experiences the LLM extracts onto canonical terms.
+
+    A term is case-folded and stripped of filler words and version numbers, then looked up in the
+    alias dictionary and the cached vocabulary (table term_vocabulary). Terms never seen before are
+    resolved in one batch: character-trigram vectors of all new terms are compared against the whole
+    canonical vocabulary of the column with one matrix product, and a term at least
+    CANONICAL_SIMILARITY close to a known canonical joins it, otherwise it becomes a new canonical.
+    Multi-word terms must also share their first word or all their words, so "project management"
+    never joins "product management". The vocabulary only grows, nothing is recomputed per report.
+    """
+    def __init__(self, logger, pool: DBPool):
+        self.logger = logger
+        self.pool = pool
+        self.threshold = float(os.getenv("CANONICAL_SIMILARITY", "0.85"))
+        self.dim = 2048             # hashed trigram buckets
+        self.min_fuzzy_length = 5   # short terms (go, sql, c++) only match exactly
+
+        self._lock = threading.Lock()
+        self._mapping = {column: {} for column in CANONICAL_COLUMNS}          # term key -> canonical
+        self._canonicals = {column: [] for column in CANONICAL_COLUMNS}       # canonical terms, matrix row order
+        self._matrix = {column: np.zeros((0, self.dim), dtype=np.float32) for column in CANONICAL_COLUMNS}
+
+        self.create_table()
+        self._load_vocabulary()
+
+        self.logger.info(
+            f"{TermCanonicalizer.__name__} initiated with {sum(len(m) for m in self._mapping.values())} "
+            f"vocabulary terms (threshold={self.threshold})."
+        )
+
+
+    def create_table(self) -> None:
+        create_table_query = """
+        CREATE TABLE IF NOT EXISTS term_vocabulary (
+            column_name TEXT NOT NULL,
+            term_key TEXT NOT NULL,
+            canonical TEXT NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (column_name, term_key)
+        );
+        """
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(create_table_query)
+            self.logger.info("Table term_vocabulary created (or already exists)")
+        except Exception as e:
+            self.logger.error(f"Failed to create term_vocabulary: {e}")
+            raise
+
+
+    def _load_vocabulary(self) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("SELECT column_name, term_key, canonical FROM term_vocabulary ORDER BY created_at")
+            rows = cur.fetchall()
+        for column, term_key, canonical in rows:
+            if column in self._mapping:
+                self._mapping[column][term_key] = canonical
+        for column in CANONICAL_COLUMNS:
+            canonicals = list(dict.fromkeys(self._mapping[column].values()))
+            self._canonicals[column] = canonicals
+            self._matrix[column] = self._vectors(canonicals)
+
+
+    @staticmethod
+    def normalize(column: str, term: str) -> str:
+        text = term.casefold()
+        text = re.sub(r"\([^)]*\)", " ", text)                  # parenthetical remarks
+        text = re.sub(r"['`]", "", text)                         # "bachelor's" -> "bachelors"
+        text = re.sub(r"[-_/,;:!?\"*]+", " ", text)
+        if column == "experiences":
+            # "3+ years of" -> "3+ years", "3 - 5 yrs" -> "3-5 years"
+            text = YEARS_PATTERN.sub(lambda m: f"{m.group(1)}-{m.group(2)} years " if m.group(2) else f"{m.group(1)}+ years ", text)
+            text = EXPERIENCE_PATTERN.sub(" ", text)
+        else:
+            text = FILLER_PATTERN.sub(" ", text)
+        if column == "skills":
+            # "python 3.11" -> "python", but "form 5" or "office 365" qualifications keep their number.
+            text = VERSION_PATTERN_ATTACHED.sub(" ", text)
+            text = VERSION_PATTERN.sub(" ", text)
+        # trailing dots only, ".net" keeps its leading one.
+        text = re.sub(r"\s+", " ", text).strip().rstrip(".").strip()
+        # a term that is all filler ("strong skills") is kept as written.
+        text = text or re.sub(r"\s+", " ", term.casefold()).strip().rstrip(".").strip()
+        return ALIASES.get(text, text)
+
+
+    def _vectors(self, terms: list[str]) -> np.ndarray:
+        """L2-normalized hashed character-trigram counts, one row per term."""
+        matrix = np.zeros((len(terms), self.dim), dtype=np.float32)
+        rows, cols = [], []
+        for i, term in enumerate(terms):
+            padded = f"  {term} "
+            for j in range(len(padded) - 2):
+                rows.append(i)
+                cols.append(zlib.crc32(padded[j:j + 3].encode("utf-8")) % self.dim)
+        np.add.at(matrix, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-9)
+
+
+    @staticmethod
+    def _compatible(term: str, canonical: str) -> bool:
+        # trigrams alone join "project management" and "product management" (0.80).
+        words, canonical_words = term.split(), canonical.split()
+        if len(words) < 2 and len(canonical_words) < 2:
+            return True
+        return words[0] == canonical_words[0] or set(words) == set(canonical_words)
+
+
+    def _best_match(self, term_key: str, similarity: np.ndarray, candidates: list[str]) -> str | None:
+        # the most similar candidate above the threshold that is compatible with the term.
+        above = np.flatnonzero(similarity >= self.threshold)
+        for j in above[np.argsort(-similarity[above])]:
+            if self._compatible(term_key, candidates[j]):
+                return candidates[j]
+        return None
+
+
+    def _resolve_new(self, column: str, term_keys: list[str]) -> dict[str, str]:
+        # term_keys are ordered by frequency, so the most common spelling becomes the canonical.
+        vectors = self._vectors(term_keys)
+        known = self._matrix[column]
+        if len(known):
+            known_similarity = vectors @ known.T
+
+        resolved = {}
+        new_keys = []       # term_keys that became canonicals
+        new_matrix = np.empty_like(vectors)     # their vectors, filled in order
+        for i, term_key in enumerate(term_keys):
+            fuzzy = len(term_key) >= self.min_fuzzy_length
+            if fuzzy and len(known):
+                match = self._best_match(term_key, known_similarity[i], self._canonicals[column])
+                if match is not None:
+                    resolved[term_key] = match
+                    continue
+            if fuzzy and new_keys:
+                match = self._best_match(term_key, new_matrix[:len(new_keys)] @ vectors[i], new_keys)
+                if match is not None:
+                    resolved[term_key] = match
+                    continue
+            resolved[term_key] = term_key
+            new_matrix[len(new_keys)] = vectors[i]
+            new_keys.append(term_key)
+
+        return resolved
+
+
+    def _store(self, column: str, resolved: dict[str, str]) -> dict[str, str]:
+        # another worker may have resolved the same keys first, the stored mapping wins.
+        with self.pool.connection() as conn, conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur,
+                "INSERT INTO term_vocabulary (column_name, term_key, canonical) VALUES %s ON CONFLICT DO NOTHING",
+                [(column, term_key, canonical) for term_key, canonical in resolved.items()],
+            )
+            cur.execute(
+                "SELECT term_key, canonical FROM term_vocabulary WHERE column_name = %s AND term_key = ANY(%s)",
+                (column, list(resolved)),
+            )
+            return dict(cur.fetchall())
+
+
+    def canonicalize(self, column: str, terms_lists: list[list[str]]) -> list[list[str]]:
+        """Canonical terms for every list of raw terms of one column, duplicates within a list removed."""
+        keys_lists = [[self.normalize(column, term) for term in terms or []] for terms in terms_lists]
+
+        with self._lock:
+            mapping = self._mapping[column]
+            counts = Counter(key for keys in keys_lists for key in keys if key and key not in mapping)
+            if counts:
+                new_keys = [key for key, _ in counts.most_common()]
+                stored = self._store(column, self._resolve_new(column, new_keys))
+                mapping.update(stored)
+                known = set(self._canonicals[column])
+                new_canonicals = [c for c in dict.fromkeys(stored.values()) if c not in known]
+                if new_canonicals:
+                    self._canonicals[column].extend(new_canonicals)
+                    self._matrix[column] = np.vstack([self._matrix[column], self._vectors(new_canonicals)])
+                self.logger.debug(f"Term vocabulary for {column} grew by {len(stored)} terms.")
+
+            return [list(dict.fromkeys(mapping[key] for key in keys if key)) for keys in keys_lists]
+
+
+    def canonicalize_jobs(self, job_items: list[JobInfo]) -> None:
+        """Fill job_item.canonical_terms for a batch of extracted jobs."""
+        items = [job_item for job_item in job_items if job_item.job_info is not None]
+        if not items:
+            return
+        canonical = {
+            column: self.canonicalize(column, [getattr(job_item.job_info, column) for job_item in items])
+            for column in CANONICAL_COLUMNS
+        }
+        for i, job_item in enumerate(items):
+            job_item.canonical_terms = {column: canonical[column][i] for column in CANONICAL_COLUMNS}
+
+
+    def backfill(self, batch_size: int = 1000) -> int:
+        """Canonicalize stored jobs without canonical terms, e.g. jobs stored before this stage existed."""
+        select_query = """
+        SELECT id, skills, qualifications, experiences
+        FROM JobAd
+        WHERE skills_canonical IS NULL AND job_title IS NOT NULL
+        LIMIT %s;
+        """
+        update_query = """
+        UPDATE JobAd j
+        SET skills_canonical = v.skills, qualifications_canonical = v.qualifications, experiences_canonical = v.experiences
+        FROM (VALUES %s) AS v(id, skills, qualifications, experiences)
+        WHERE j.id = v.id;
+        """
+        total = 0
+        while True:
+            with self.pool.connection() as conn, conn.cursor() as cur:
+                cur.execute(select_query, (batch_size,))
+                rows = cur.fetchall()
+            if not rows:
+                break
+            canonical = {
+                column: self.canonicalize(column, [row[i + 1] or [] for row in rows])
+                for i, column in enumerate(CANONICAL_COLUMNS)
+            }
+            values = [
+                (row[0], *(canonical[column][i] for column in CANONICAL_COLUMNS))
+                for i, row in enumerate(rows)
+            ]
+            with self.pool.connection() as conn:
+                conn.autocommit = False
+                with conn, conn.cursor() as cur:
+                    psycopg2.extras.execute_values(
+                        cur, update_query, values, template="(%s, %s::text[], %s::text[], %s::text[])"
+                    )
+            total += len(rows)
+
+        self.logger.info(f"Canonicalized terms of {total} stored jobs.")
+        return total
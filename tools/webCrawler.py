@@ -1,15 +1,41 @@
 from crawl4ai import AsyncWebCrawler, CrawlerRunConfig, CacheMode, BrowserConfig, MemoryAdaptiveDispatcher, CrawlResult
 from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
+from crawl4ai.async_crawler_strategy import AsyncHTTPCrawlerStrategy
+from crawl4ai.async_configs import HTTPCrawlerConfig
 
-from typing import List
+from tools.HostRateLimiter import HostRateLimiter
+from tools.PageCache import PageCache
+from tools.Metrics import metrics
+
+import aiohttp
+
+from typing import List, AsyncIterator
 import asyncio
 from pprint import pformat
+import os
 import re
+from dotenv import load_dotenv
+
+load_dotenv()
 
 
 class WebCrawler:
+    """
+    Long-lived crawler session: one headless browser (and optionally one plain HTTP client)
+    is started on enter and reused for every search and job page crawl until exit.
+
+        async with WebCrawler(logger) as crawler:
+            links = await crawler.crawl_job_links(keyword, total_pages)
+
+    Pages that don't need JS rendering can be fetched over HTTP only (no browser) with
+    CRAWLER_HTTP_ONLY_SEARCH / CRAWLER_HTTP_ONLY_JOB_PAGES.
+    """
     def __init__(self, logger):
         self.logger = logger
+        self.http_only_search = os.getenv("CRAWLER_HTTP_ONLY_SEARCH", "false").lower() == "true"
+        self.http_only_job_pages = os.getenv("CRAWLER_HTTP_ONLY_JOB_PAGES", "false").lower() == "true"
+        self.max_retries = int(os.getenv("CRAWLER_MAX_RETRIES", "3"))
+        self.use_page_cache = os.getenv("PAGE_CACHE", "true").lower() == "true"
         self.browser_config = BrowserConfig(
             headless=True,
             text_mode=True,
@@ -30,25 +56,119 @@ class WebCrawler:
             exclude_external_links=True,
             cache_mode=CacheMode.BYPASS,
         )
-        self.dispatcher = MemoryAdaptiveDispatcher(
+        self.rate_limiter = HostRateLimiter(logger=logger)
+        
+        self.browser_crawler = None
+        self.http_crawler = None
+        self.page_cache = None
+        self.http_session = None
+        
+        self.logger.info(
+            f"{WebCrawler.__name__} initiated (http_only_search={self.http_only_search}, "
+            f"http_only_job_pages={self.http_only_job_pages})."
+        )
+
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+    async def start(self) -> None:
+        # only start what the configured phases need, the browser is the expensive part.
+        if not (self.http_only_search and self.http_only_job_pages) and self.browser_crawler is None:
+            self.browser_crawler = AsyncWebCrawler(config=self.browser_config)
+            await self.browser_crawler.start()
+            self.logger.info("Browser crawler session started.")
+        if (self.http_only_search or self.http_only_job_pages) and self.http_crawler is None:
+            self.http_crawler = AsyncWebCrawler(
+                crawler_strategy=AsyncHTTPCrawlerStrategy(browser_config=HTTPCrawlerConfig())
+            )
+            await self.http_crawler.start()
+            self.logger.info("HTTP crawler session started.")
+        if self.use_page_cache and self.page_cache is None:
+            self.page_cache = PageCache(logger=self.logger)
+            # plain client for the cheap conditional requests, pages are still rendered by the crawler.
+            self.http_session = aiohttp.ClientSession(
+                headers={"User-Agent": self.browser_config.user_agent},
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+
+
+    async def close(self) -> None:
+        for crawler in (self.browser_crawler, self.http_crawler):
+            if crawler is not None:
+                await crawler.close()
+        if self.http_session is not None:
+            await self.http_session.close()
+        if self.page_cache is not None:
+            self.page_cache.close()
+        self.browser_crawler = None
+        self.http_crawler = None
+        self.page_cache = None
+        self.http_session = None
+        self.logger.info("Crawler sessions closed.")
+
+
+    def _session(self, http_only: bool) -> AsyncWebCrawler:
+        crawler = self.http_crawler if http_only else self.browser_crawler
+        if crawler is None:
+            raise RuntimeError(f"{WebCrawler.__name__} session is not started, use 'async with WebCrawler(...)'")
+        return crawler
+
+
+    def _new_dispatcher(self) -> MemoryAdaptiveDispatcher:
+        # a dispatcher keeps per-run task state, so concurrent crawls (several keywords) each get one.
+        # the rate limiter is shared, so the per-host pace holds across all of them.
+        return MemoryAdaptiveDispatcher(
             memory_threshold_percent=70,
             check_interval=1,
-            max_session_permit=6
+            max_session_permit=6,
+            rate_limiter=self.rate_limiter
         )
-        
-        self.logger.info(f"{WebCrawler.__name__} initiated.")
 
 
-    async def _crawl_pages(self, urls: List[str], config: CrawlerRunConfig) -> List[CrawlResult]:
-        async with AsyncWebCrawler(config=self.browser_config) as crawler:
-            results = await crawler.arun_many(
-                urls=urls, 
+    def _should_retry(self, result: CrawlResult) -> bool:
+        # throttled, server errors and network failures are retried, 4xx like 404 are final.
+        if self.rate_limiter.is_throttled(result):
+            return True
+        return not result.success and (result.status_code is None or result.status_code >= 500)
+
+
+    @staticmethod
+    def _count_page(result: CrawlResult) -> None:
+        metrics.incr("crawled_pages_total" if result.success else "crawl_failures_total")
+
+
+    async def _crawl_pages(self, urls: List[str], config: CrawlerRunConfig, http_only: bool = False) -> List[CrawlResult]:
+        results = {}
+        pending = urls
+        for attempt in range(self.max_retries + 1):
+            retry = []
+            for result in await self._session(http_only).arun_many(
+                urls=pending, 
                 config=config,
-                dispatcher=self.dispatcher
-            )
-        self.logger.info(f"Total {len(results)} job pages crawled.")
+                dispatcher=self._new_dispatcher()
+            ):
+                self.rate_limiter.observe(result)
+                if attempt < self.max_retries and self._should_retry(result):
+                    retry.append(result.url)
+                else:
+                    results[result.url] = result
+                    self._count_page(result)
+            if not retry:
+                break
+            metrics.incr("crawl_retries_total", len(retry))
+            self.logger.info(f"Retrying {len(retry)} throttled or failed pages (attempt {attempt + 1}).")
+            pending = retry
+        self.logger.info(f"Total {len(results)} pages crawled.")
+        self.rate_limiter.log_stats()
                 
-        return results
+        return list(results.values())
     
     
     def _extract_job_links(self, results: List[CrawlResult]) -> List[str]:
@@ -72,21 +192,98 @@ class WebCrawler:
         return urls
 
 
-    def crawl_all_job_pages(self, keyword: str, total_pages: int) -> List[CrawlResult]: 
-        # Generate search pages.
+    async def crawl_job_links(self, keyword: str, total_pages: int) -> List[str]:
+        # crawl the search pages and return the job ad links found on them.
         urls = self._generate_urls(keyword=keyword, total_page=total_pages)
-        for i, url in enumerate(urls):
-            print(f"{i}: {url}")
-
-        # crawl all links for job pages from search pages.
-        results = asyncio.run(self._crawl_pages(urls=urls, config=self.crawl_config_search))
-        
-        # extract job ad links.
-        job_links = self._extract_job_links(results=results)
+        with metrics.timer("crawl_search_pages"):
+            results = await self._crawl_pages(urls=urls, config=self.crawl_config_search, http_only=self.http_only_search)
         
-        # crawl all contents from each job pages.
-        job_results = asyncio.run(self._crawl_pages(urls=job_links, config=self.crawl_config_job))
-        
-        return job_results
+        return self._extract_job_links(results=results)
+
+
+    async def _not_modified(self, url: str, headers: dict) -> bool:
+        await self.rate_limiter.wait_if_needed(url)
+        try:
+            async with self.http_session.get(url, headers=headers, allow_redirects=False) as response:
+                status, response_headers = response.status, dict(response.headers)
+        except Exception as e:
+            self.rate_limiter.observe(CrawlResult(url=url, html="", success=False, error_message=str(e)))
+            return False
+        self.rate_limiter.observe(CrawlResult(
+            url=url, html="", success=status in (200, 304), status_code=status, response_headers=response_headers
+        ))
+        return status == 304
+
+
+    async def check_not_modified(self, urls: List[str]) -> set[str]:
+        """Send conditional requests for cached pages, return the urls the server reports as not modified."""
+        if self.page_cache is None:
+            return set()
+        candidates = {url: headers for url in urls if (headers := self.page_cache.conditional_headers(url))}
+        if not candidates:
+            return set()
+
+        results = await asyncio.gather(*(self._not_modified(url, headers) for url, headers in candidates.items()))
+        not_modified = {url for url, unchanged in zip(candidates, results) if unchanged}
+        for url in not_modified:
+            self.page_cache.record_not_modified(url)
+        self.logger.info(f"Conditional requests: {len(not_modified)} of {len(candidates)} cached job pages not modified.")
+
+        return not_modified
+
+
+    def is_unchanged(self, result: CrawlResult) -> bool:
+        """Record a crawled page in the page cache, True if its content is identical to the last crawl."""
+        if self.page_cache is None:
+            return False
+        return not self.page_cache.update(result)
+
+
+    async def stream_job_pages(self, urls: List[str]) -> AsyncIterator[CrawlResult]:
+        # yield each job page as soon as it is crawled instead of waiting for the whole batch.
+        if not urls:
+            return
+        stream_config = self.crawl_config_job.clone(stream=True)
+        total = 0
+        pending = urls
+        for attempt in range(self.max_retries + 1):
+            retry = []
+            async for result in await self._session(self.http_only_job_pages).arun_many(
+                urls=pending,
+                config=stream_config,
+                dispatcher=self._new_dispatcher()
+            ):
+                self.rate_limiter.observe(result)
+                if attempt < self.max_retries and self._should_retry(result):
+                    retry.append(result.url)
+                    continue
+                total += 1
+                self._count_page(result)
+                yield result
+            if not retry:
+                break
+            metrics.incr("crawl_retries_total", len(retry))
+            self.logger.info(f"Retrying {len(retry)} throttled or failed job pages (attempt {attempt + 1}).")
+            pending = retry
+        self.logger.info(f"Total {total} job pages streamed.")
+        self.rate_limiter.log_stats()
+
+
+    async def _crawl_all_job_pages(self, keyword: str, total_pages: int) -> List[CrawlResult]:
+        async with self:
+            # crawl all links for job pages from search pages.
+            job_links = await self.crawl_job_links(keyword=keyword, total_pages=total_pages)
+            
+            # crawl all contents from each job pages.
+            return await self._crawl_pages(
+                urls=job_links,
+                config=self.crawl_config_job,
+                http_only=self.http_only_job_pages
+            )
+
+
+    def crawl_all_job_pages(self, keyword: str, total_pages: int) -> List[CrawlResult]: 
+        # both phases share one browser session and one event loop.
+        return asyncio.run(self._crawl_all_job_pages(keyword=keyword, total_pages=total_pages))
         
         